@@ -1,15 +1,27 @@
 import os
+import sys
+import time
 import numpy as np
 import wave
 import pyaudio
 from pydub import AudioSegment
 
+from pwm_calibration import DutyWriter, load_profile
+
+# Métriques du projet (metrics.py à la racine du dépôt)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import metrics
+
 # Chemin du PWM
 PWM_PATH = "/sys/class/pwm/pwmchip0/pwm0/"
 DUTY_MAX = 25000  # Duty cycle max en nanosecondes
+DUTY_STEP = 1     # Pas de quantification du duty cycle (ns), donné par le profil
+CHUNK = 1024      # Taille du buffer de lecture (trames), donnée par le profil
+writer = None     # Écriture du duty_cycle (mode calibré, descripteur gardé ouvert par défaut)
 
 # Initialisation du PWM
-def pwm_init(period_ns):
+def pwm_init(period_ns, write_mode="fd"):
+    global writer
     if not os.path.exists(PWM_PATH):
         with open("/sys/class/pwm/pwmchip0/export", "w") as f:
             f.write("0")
@@ -19,41 +31,90 @@ def pwm_init(period_ns):
         f.write(str(period_ns))
     with open(PWM_PATH + "enable", "w") as f:
         f.write("1")
+    writer = DutyWriter(PWM_PATH, write_mode)
+
+# Initialisation du PWM d'après le profil de calibration s'il existe
+# (python3 pwm_calibration.py), sinon 40 kHz ; renvoie la fréquence
+# d'échantillonnage du profil (None sans profil)
+def pwm_setup():
+    global DUTY_MAX, DUTY_STEP, CHUNK
+    profile = load_profile()
+    if profile is not None:
+        pwm_frequency = profile["pwm_frequency"]
+        DUTY_MAX = profile["duty_max"]
+        DUTY_STEP = profile["duty_step_ns"]
+        CHUNK = profile["block_size"]
+        sample_rate = profile["sample_rate"]
+        write_mode = profile.get("write_mode", "fd")
+        print(f"Profil PWM : {sample_rate} Hz, PWM {pwm_frequency} Hz, "
+              f"blocs de {CHUNK}, pas {DUTY_STEP} ns, écriture {write_mode}")
+    else:
+        pwm_frequency = 40000  # 40 kHz
+        sample_rate = None
+        write_mode = "fd"
+    period_ns = int(1e9 / pwm_frequency)
+    pwm_init(period_ns, write_mode)
+    return sample_rate
 
-# Mise à jour du duty cycle
+# Mise à jour du duty cycle (arrondi au pas de l'horloge PWM)
 def update_duty_cycle(value):
     duty_ns = int(value * DUTY_MAX)
-    with open(PWM_PATH + "duty_cycle", "w") as f:
-        f.write(str(duty_ns))
+    writer.write(duty_ns - duty_ns % DUTY_STEP)
 
-# Convertir un fichier MP3 en WAV
-def convert_mp3_to_wav(mp3_file, wav_file):
-    audio = AudioSegment.from_mp3(mp3_file)
+# Convertir un fichier MP3 en WAV mono (rééchantillonné si frame_rate est donné)
+def convert_mp3_to_wav(mp3_file, wav_file, frame_rate=None):
+    audio = AudioSegment.from_mp3(mp3_file).set_channels(1)
+    if frame_rate is not None:
+        audio = audio.set_frame_rate(frame_rate)
     audio.export(wav_file, format="wav")
 
+# Convertir un bloc PCM 16 bits en valeurs de duty cycle normalisées [0, 1],
+# une valeur par trame (les canaux d'un fichier stéréo sont moyennés)
+def normalize_samples(data, channels=1):
+    max_amplitude = 2**15 - 1  # Amplitude max pour format 16 bits
+    audio_samples = np.frombuffer(data, dtype=np.int16).astype(np.float32)
+    if channels > 1:
+        audio_samples = audio_samples.reshape(-1, channels).mean(axis=1)
+    return (audio_samples + max_amplitude) / (2 * max_amplitude)
+
 # Lecture et traitement du fichier audio
-def process_audio_file(wav_file):
+# (paced=False : écritures sans attente, pour les mesures de bench.py)
+def process_audio_file(wav_file, paced=True):
     # Charger le fichier WAV
     wf = wave.open(wav_file, 'rb')
     rate = wf.getframerate()
-    chunk = 1024  # Taille du buffer
-    max_amplitude = 2**15 - 1  # Amplitude max pour format 16 bits
+    channels = wf.getnchannels()
+    chunk = CHUNK  # Taille du buffer
 
     # Initialisation de PyAudio
     p = pyaudio.PyAudio()
     stream = wf.readframes
 
     print(f"Lecture du fichier audio {wav_file} en cours...")
+    period = 1.0 / rate
+    next_t = time.perf_counter()
     try:
         data = wf.readframes(chunk)
         while data:
-            # Convertir les données audio en tableau NumPy
-            audio_samples = np.frombuffer(data, dtype=np.int16).astype(np.float32)
-            normalized_samples = (audio_samples + max_amplitude) / (2 * max_amplitude)  # Normaliser [0, 1]
+            # Convertir les données audio en tableau NumPy normalisé [0, 1]
+            normalized_samples = normalize_samples(data, channels)
 
-            # Mettre à jour le duty cycle pour chaque échantillon
+            # Mettre à jour le duty cycle pour chaque trame,
+            # cadencé sur la fréquence d'échantillonnage du fichier
             for sample in normalized_samples:
                 update_duty_cycle(sample)
+                if not paced:
+                    continue
+                next_t += period
+                now = time.perf_counter()
+                if now > next_t + period:
+                    # En retard de plus d'un échantillon : on se recale
+                    metrics.pwm_late_samples.inc()
+                    next_t = now
+                else:
+                    while time.perf_counter() < next_t:
+                        pass
+            metrics.pwm_writes.inc(len(normalized_samples))
 
             # Lire le prochain bloc
             data = wf.readframes(chunk)
@@ -65,6 +126,8 @@ def process_audio_file(wav_file):
 
 # Arrêter proprement le PWM
 def pwm_cleanup():
+    if writer is not None:
+        writer.close()
     with open(PWM_PATH + "enable", "w") as f:
         f.write("0")
     with open("/sys/class/pwm/pwmchip0/unexport", "w") as f:
@@ -72,16 +135,15 @@ def pwm_cleanup():
 
 # Programme principal
 if __name__ == "__main__":
+    metrics.start_exporters()
     try:
-        # Définir la fréquence PWM
-        pwm_frequency = 40000  # 40 kHz
-        period_ns = int(1e9 / pwm_frequency)
-        pwm_init(period_ns)
+        # Fréquence PWM, pas du duty cycle et taille de bloc : profil de calibration
+        sample_rate = pwm_setup()
 
         # Convertir un fichier MP3 en WAV
         mp3_file = "/home/PFE/AudioTests/Sardines.mp3"  # Chemin vers votre fichier MP3
         wav_file = "/home/PFE/AudioTests/Sardines.wav"
-        convert_mp3_to_wav(mp3_file, wav_file)
+        convert_mp3_to_wav(mp3_file, wav_file, sample_rate)
 
         # Lancer le traitement audio
         process_audio_file(wav_file)
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Calibration du débit d'écriture PWM (sysfs duty_cycle).
+
+Les lecteurs écrivent un duty_cycle par échantillon : la fréquence
+d'échantillonnage jouable est donc limitée par le nombre d'écritures
+sysfs par seconde. Ce script mesure le débit soutenu et la gigue des
+écritures sur le système courant, vérifie le rythme retenu en écriture
+cadencée (sous-débits), puis enregistre un profil JSON : fréquence
+d'échantillonnage, taille de bloc, fréquence PWM et pas de quantification.
+
+Avec --fake, la mesure se fait sur une arborescence sysfs simulée avec un
+coût d'écriture artificiel (--cost-us), pour tester hors du Pi.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import numpy as np
+
+# -------------------------------------------------------
+# CONFIG
+PWM_PATH = "/sys/class/pwm/pwmchip0/pwm0/"
+PROFILE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pwm_profile.json")
+
+CANDIDATE_RATES = (8000, 11025, 16000, 22050, 32000, 44100)
+HEADROOM = 0.8         # On ne vise que 80 % du débit soutenu mesuré
+MAX_MISSED = 0.001     # Part maximale d'échéances manquées en écriture cadencée
+MIN_RATE = 1000        # Fréquence d'échantillonnage minimale acceptée
+BLOCK_MS = 20          # Durée d'un bloc de lecture
+MIN_PWM_FREQ = 40000   # Fréquence PWM des scripts existants
+PWM_CLOCK_NS = 1e9 / 19.2e6  # Pas de l'horloge PWM du Pi (19,2 MHz)
+
+# -------------------------------------------------------
+# ÉCRITURE DU DUTY CYCLE
+class DutyWriter:
+    """
+    Écrit duty_cycle soit en rouvrant le fichier à chaque valeur (comme
+    update_duty_cycle des lecteurs), soit sur un descripteur gardé ouvert.
+    cost_us ajoute un coût artificiel par écriture (backend simulé).
+    """
+
+    def __init__(self, pwm_path=PWM_PATH, mode="fd", cost_us=0.0):
+        self.path = os.path.join(pwm_path, "duty_cycle")
+        self.mode = mode
+        self.cost_s = cost_us / 1e6
+        self.fd = os.open(self.path, os.O_WRONLY) if mode == "fd" else None
+
+    def write(self, duty_ns):
+        data = b"%d" % duty_ns
+        if self.fd is not None:
+            os.pwrite(self.fd, data, 0)
+        else:
+            with open(self.path, "wb") as f:
+                f.write(data)
+        if self.cost_s:
+            end = time.perf_counter() + self.cost_s
+            while time.perf_counter() < end:
+                pass
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+
+def fake_pwm_dir(root):
+    """
+    Crée une arborescence pwmchip0/pwm0 simulée dans root (dossier
+    temporaire à la charge de l'appelant) et renvoie le chemin de pwm0.
+    """
+    pwm_path = os.path.join(root, "pwmchip0", "pwm0")
+    os.makedirs(pwm_path)
+    for name, value in (("period", "25000"), ("duty_cycle", "0"), ("enable", "0")):
+        with open(os.path.join(pwm_path, name), "w") as f:
+            f.write(value)
+    return pwm_path + "/"
+
+# -------------------------------------------------------
+# MESURES
+def measure_burst(writer, duration=1.0, duty_max=25000):
+    """Écritures à pleine vitesse : débit soutenu et gigue entre écritures."""
+    values = (np.sin(np.linspace(0, 200 * np.pi, 4096)) * 0.5 + 0.5) * duty_max
+    values = values.astype(np.int64).tolist()
+    stamps = []
+    start = time.perf_counter()
+    end = start + duration
+    i = 0
+    while True:
+        writer.write(values[i & 4095])
+        now = time.perf_counter()
+        stamps.append(now)
+        i += 1
+        if now >= end:
+            break
+    intervals = np.diff(stamps) * 1e6
+    return {
+        "rate": i / (stamps[-1] - start),
+        "interval_mean_us": float(intervals.mean()),
+        "interval_std_us": float(intervals.std()),
+        "interval_p99_us": float(np.percentile(intervals, 99)),
+    }
+
+def measure_paced(writer, rate, duration=1.0, duty_max=25000):
+    """Écritures cadencées à rate : part des échéances manquées."""
+    period = 1.0 / rate
+    n = int(rate * duration)
+    missed = 0
+    next_t = time.perf_counter()
+    for i in range(n):
+        writer.write((i & 1) * duty_max)
+        next_t += period
+        now = time.perf_counter()
+        if now > next_t + period:
+            # En retard de plus d'un échantillon : sous-débit
+            missed += 1
+            next_t = now
+        else:
+            while time.perf_counter() < next_t:
+                pass
+    return missed / n
+
+# -------------------------------------------------------
+# CHOIX DE LA CONFIGURATION
+def pick_profile(burst, mode, paced_check):
+    """
+    Choisit la fréquence la plus haute tenue sans sous-débit. Si aucune
+    fréquence candidate ne passe (ou si le débit utilisable est sous la
+    plus petite, auquel cas on essaie ce débit), on divise par deux puis on
+    termine par MIN_RATE ; jamais au-dessus d'une fréquence en échec.
+    """
+    usable = burst["rate"] * HEADROOM
+    rates = [r for r in reversed(CANDIDATE_RATES) if r <= usable]
+    if not rates and usable >= MIN_RATE:
+        # Débit sous la plus petite fréquence candidate : on essaie le débit lui-même
+        rates.append(int(usable))
+    lowest = rates[-1] if rates else 0
+    while lowest // 2 >= MIN_RATE:
+        lowest //= 2
+        rates.append(lowest)
+    if rates and rates[-1] > MIN_RATE:
+        rates.append(MIN_RATE)
+    sample_rate = None
+    missed = None
+    for rate in rates:
+        missed = paced_check(rate)
+        if missed <= MAX_MISSED:
+            sample_rate = rate
+            break
+    if sample_rate is None:
+        raise RuntimeError(f"Aucune fréquence >= {MIN_RATE} Hz tenue sans sous-débit "
+                           f"(débit mesuré {burst['rate']:.0f} écritures/s)")
+    pwm_frequency = max(MIN_PWM_FREQ, 4 * sample_rate)
+    period_ns = int(1e9 / pwm_frequency)
+    levels = int(period_ns / PWM_CLOCK_NS)
+    return {
+        "sample_rate": sample_rate,
+        "block_size": sample_rate * BLOCK_MS // 1000,
+        "pwm_frequency": pwm_frequency,
+        "period_ns": period_ns,
+        "duty_max": period_ns,
+        "duty_step_ns": max(1, int(round(period_ns / levels))) if levels else 1,
+        "duty_levels": levels,
+        "write_mode": mode,
+        "write_rate": burst["rate"],
+        "write_interval_p99_us": burst["interval_p99_us"],
+        "missed_ratio": missed,
+        "measured_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+def calibrate(pwm_path=PWM_PATH, cost_us=0.0, duration=1.0):
+    """Mesure les deux modes d'écriture et renvoie le profil du meilleur."""
+    results = {}
+    for mode in ("reopen", "fd"):
+        writer = DutyWriter(pwm_path, mode, cost_us)
+        try:
+            results[mode] = measure_burst(writer, duration)
+        finally:
+            writer.close()
+        print(f"[CALIB] {mode:6s} : {results[mode]['rate']:9.0f} écritures/s, "
+              f"gigue {results[mode]['interval_std_us']:.1f} µs, "
+              f"p99 {results[mode]['interval_p99_us']:.1f} µs")
+    mode = max(results, key=lambda m: results[m]["rate"])
+
+    def paced_check(rate):
+        writer = DutyWriter(pwm_path, mode, cost_us)
+        try:
+            missed = measure_paced(writer, rate, duration)
+        finally:
+            writer.close()
+        print(f"[CALIB] {rate} Hz cadencé : {100 * missed:.2f} % d'échéances manquées")
+        return missed
+
+    return pick_profile(results[mode], mode, paced_check)
+
+def save_profile(profile, path=PROFILE_PATH):
+    with open(path, "w") as f:
+        json.dump(profile, f, indent=2)
+
+def load_profile(path=PROFILE_PATH):
+    """Profil enregistré, ou None si la calibration n'a pas encore été faite."""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+# -------------------------------------------------------
+# PROGRAMME PRINCIPAL
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calibration du débit PWM sysfs")
+    parser.add_argument("--fake", action="store_true", help="sysfs simulé")
+    parser.add_argument("--cost-us", type=float, default=0.0,
+                        help="coût artificiel par écriture (µs)")
+    parser.add_argument("--duration", type=float, default=1.0)
+    parser.add_argument("--output", default=PROFILE_PATH)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="fake_pwm_") as root:
+        path = fake_pwm_dir(root) if args.fake else PWM_PATH
+        profile = calibrate(path, args.cost_us, args.duration)
+    save_profile(profile, args.output)
+    print(f"[CALIB] Profil : {profile['sample_rate']} Hz, blocs de {profile['block_size']}, "
+          f"PWM {profile['pwm_frequency']} Hz, {profile['duty_levels']} niveaux "
+          f"-> {args.output}")
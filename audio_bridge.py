@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+Pont temps réel micro (MCP3008) -> baresip.
+
+Un thread de capture lit l'ADC par trames de 20 ms, les passe dans la
+chaîne DSP (capture_dsp) et les dépose dans une file bornée. Un thread
+d'envoi les écrit dans un tube nommé ou un socket Unix lu par baresip
+(PCM s16le 8 kHz mono, ou G.711 si law est donné).
+
+Contre-pression : si le lecteur ne suit pas, l'écriture bloque le thread
+d'envoi, la file se remplit et la capture jette alors la trame la plus
+ancienne (comptée dans "trames_jetees") plutôt que de perdre le rythme
+de l'ADC. La latence bouche -> fil est mesurée pour chaque trame, du
+premier échantillon capté jusqu'à la fin de l'écriture (fenêtre des
+dernières trames pour report(), histogramme pfe_capture_to_wire_seconds).
+
+Côté baresip, le micro est lu sur ALSA : le tube est recopié dans la
+boucle ALSA (module snd-aloop) et baresip lit l'autre extrémité, avec
+dans ~/.baresip/config :
+    audio_source    alsa,plughw:Loopback,1,0
+et, lancé par start_baresip.sh :
+    aplay -t raw -f S16_LE -r 8000 -c 1 -D plughw:Loopback,0,0 /tmp/pfe_mic.pcm
+
+baresip_ctrl.py démarre le pont (et y branche la détection DTMF) ; seul :
+    python3 audio_bridge.py            # MCP3008 -> DSP -> tube PIPE_PATH
+    python3 audio_bridge.py --fake     # ADC simulé, même sortie
+    python3 audio_bridge.py --demo     # essai avec un lecteur local rapide / lent
+"""
+import argparse
+import collections
+import errno
+import fcntl
+import os
+import queue
+import select
+import socket
+import tempfile
+import threading
+import time
+import numpy as np
+
+import metrics
+from capture_dsp import default_chain
+from g711 import pcm_to_g711
+
+# -------------------------------------------------------
+# CONFIG
+SAMPLE_RATE = 8000
+FRAME_SIZE  = 160      # 20 ms à 8 kHz
+QUEUE_FRAMES = 5       # Profondeur de la file (100 ms)
+PIPE_PATH   = "/tmp/pfe_mic.pcm"
+SINK_BUFFER = 4096     # Tampon noyau de la sortie (~250 ms en s16le)
+LATENCY_WINDOW = 500   # Trames gardées pour les percentiles de report() (10 s)
+WAIT_S      = 0.1      # Attente maximale avant de revérifier l'arrêt
+
+# -------------------------------------------------------
+# SOURCES ADC
+class SpiADC:
+    """
+    MCP3008 sur SPI avec CS manuel : même initialisation et même lecture
+    (init_adc / read_adc) que testRecordSPI.py, cadencées ici sur
+    l'horloge d'échantillonnage (realtime=False : sans attente).
+    """
+
+    def __init__(self, channel=0, sample_rate=SAMPLE_RATE, realtime=True):
+        import testRecordSPI
+        testRecordSPI.init_adc()
+        self.adc = testRecordSPI
+        self.channel = channel
+        self.period = 1.0 / sample_rate
+        self.realtime = realtime
+        self._next_t = None
+
+    def read_block(self, out):
+        """Remplit out de codes 10 bits, cadencés sur l'horloge d'échantillonnage."""
+        if self._next_t is None:
+            self._next_t = time.monotonic()
+        read_adc = self.adc.read_adc
+        for i in range(len(out)):
+            out[i] = read_adc(self.channel)
+            if self.realtime:
+                self._next_t += self.period
+                delay = self._next_t - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+        return out
+
+    def close(self):
+        self.adc.spi.close()
+        self.adc.GPIO.cleanup(self.adc.CS_PIN)
+
+
+class FakeADC:
+    """
+    ADC simulé : voix factice (440 Hz modulé) autour d'un décalage de
+    continu, bruitée, rendue au rythme réel de l'échantillonnage.
+    """
+
+    def __init__(self, sample_rate=SAMPLE_RATE, offset=540, amplitude=40,
+                 noise=2.0, realtime=True, seed=0):
+        self.sample_rate = sample_rate
+        self.offset = offset
+        self.amplitude = amplitude
+        self.noise = noise
+        self.realtime = realtime
+        self.rng = np.random.default_rng(seed)
+        self.n = 0
+        self._t0 = None
+
+    def read_block(self, out):
+        if self._t0 is None:
+            self._t0 = time.monotonic()
+        t = (self.n + np.arange(len(out))) / self.sample_rate
+        signal = (self.offset
+                  + self.amplitude * np.sin(2 * np.pi * 440 * t) * np.sin(2 * np.pi * 2 * t)
+                  + self.noise * self.rng.standard_normal(len(out)))
+        out[:] = np.clip(np.round(signal), 0, 1023)
+        self.n += len(out)
+        if self.realtime:
+            delay = self._t0 + self.n / self.sample_rate - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        return out
+
+    def close(self):
+        pass
+
+# -------------------------------------------------------
+# SORTIES VERS BARESIP
+class FifoSink:
+    """
+    Tube nommé. Ouverture et écriture non bloquantes : write() attend un
+    lecteur puis de la place dans le tube par pas de WAIT_S, et rend la
+    main dès qu'interrupt() a été appelé. Après disconnect(), le prochain
+    write() attend un nouveau lecteur.
+    """
+
+    def __init__(self, path=PIPE_PATH, buffer_size=SINK_BUFFER):
+        self.path = path
+        self.buffer_size = buffer_size
+        if not os.path.exists(path):
+            os.mkfifo(path)
+        self.fd = None
+        self.interrupted = threading.Event()
+
+    def _open(self):
+        while self.fd is None and not self.interrupted.is_set():
+            try:
+                self.fd = os.open(self.path, os.O_WRONLY | os.O_NONBLOCK)
+            except OSError as e:
+                # ENXIO : pas encore de lecteur sur le tube
+                if e.errno != errno.ENXIO:
+                    raise
+                self.interrupted.wait(WAIT_S)
+                continue
+            # Tube court : la contre-pression arrive vite au lieu de cacher
+            # plusieurs secondes de retard dans le noyau
+            fcntl.fcntl(self.fd, fcntl.F_SETPIPE_SZ, self.buffer_size)
+
+    def write(self, data):
+        self._open()
+        view = memoryview(data)
+        while view and not self.interrupted.is_set():
+            try:
+                view = view[os.write(self.fd, view):]
+            except BlockingIOError:
+                # Tube plein : le lecteur ne suit pas
+                select.select([], [self.fd], [], WAIT_S)
+
+    def interrupt(self):
+        self.interrupted.set()
+
+    def disconnect(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def close(self):
+        self.disconnect()
+
+
+class SocketSink:
+    """
+    Socket Unix en écoute ; un seul lecteur à la fois. Comme FifoSink,
+    l'attente du lecteur et de l'envoi s'arrête sur interrupt().
+    """
+
+    def __init__(self, path=PIPE_PATH, buffer_size=SINK_BUFFER):
+        self.path = path
+        self.buffer_size = buffer_size
+        if os.path.exists(path):
+            os.unlink(path)
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(path)
+        self.server.listen(1)
+        self.server.settimeout(WAIT_S)
+        self.conn = None
+        self.interrupted = threading.Event()
+
+    def write(self, data):
+        while self.conn is None and not self.interrupted.is_set():
+            try:
+                self.conn, _ = self.server.accept()
+            except socket.timeout:
+                continue
+            self.conn.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.buffer_size)
+            self.conn.settimeout(WAIT_S)
+        view = memoryview(data)
+        while view and not self.interrupted.is_set():
+            try:
+                view = view[self.conn.send(view):]
+            except socket.timeout:
+                continue
+
+    def interrupt(self):
+        self.interrupted.set()
+
+    def disconnect(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def close(self):
+        self.disconnect()
+        self.server.close()
+        os.unlink(self.path)
+
+# -------------------------------------------------------
+# PONT
+class AudioBridge:
+    """
+    Capture -> DSP -> file bornée -> sortie. listeners reçoit chaque trame
+    PCM int16 traitée, dans le thread de capture (baresip_ctrl y branche
+    DTMFDetector.feed après mise à l'échelle dans [-1, 1]).
+    """
+
+    def __init__(self, adc, sink, frame_size=FRAME_SIZE, sample_rate=SAMPLE_RATE,
+                 queue_frames=QUEUE_FRAMES, law=None, listeners=()):
+        self.adc = adc
+        self.sink = sink
+        self.frame_size = frame_size
+        self.frame_s = frame_size / sample_rate
+        self.law = law
+        self.listeners = list(listeners)
+        self.chain = default_chain(frame_size, sample_rate)
+        self.frames = queue.Queue(maxsize=queue_frames)
+        self.running = False
+        self.latencies = collections.deque(maxlen=LATENCY_WINDOW)
+        self.stats = {"captees": 0, "envoyees": 0, "trames_jetees": 0, "deconnexions": 0}
+        self._threads = []
+
+    def start(self):
+        self.running = True
+        self._threads = [threading.Thread(target=self._capture_loop, daemon=True),
+                         threading.Thread(target=self._send_loop, daemon=True)]
+        for th in self._threads:
+            th.start()
+
+    def stop(self):
+        self.running = False
+        # Débloque le thread d'envoi s'il attend un lecteur ou de la place
+        self.sink.interrupt()
+        for th in self._threads:
+            th.join(timeout=1.0)
+        self.sink.close()
+        self.adc.close()
+
+    def _capture_loop(self):
+        codes = np.empty(self.frame_size, dtype=np.int16)
+        while self.running:
+            self.adc.read_block(codes)
+            metrics.spi_samples.inc(self.frame_size)
+            # Instant du premier échantillon de la trame
+            t_first = time.monotonic() - self.frame_s
+            pcm = self.chain.process_adc(codes)
+            for listener in self.listeners:
+                listener(pcm)
+            if self.law is None:
+                data = pcm.astype('<i2').tobytes()
+            else:
+                data = pcm_to_g711(pcm, self.law).tobytes()
+            self.stats["captees"] += 1
+            try:
+                self.frames.put_nowait((data, t_first))
+            except queue.Full:
+                # Lecteur trop lent : on sacrifie la trame la plus ancienne
+                try:
+                    self.frames.get_nowait()
+                except queue.Empty:
+                    pass
+                self.stats["trames_jetees"] += 1
+                metrics.capture_drops.inc()
+                self.frames.put_nowait((data, t_first))
+
+    def _send_loop(self):
+        while self.running:
+            try:
+                data, t_first = self.frames.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            try:
+                self.sink.write(data)
+            except (BrokenPipeError, ConnectionResetError):
+                # Le lecteur est parti : la capture (et la détection DTMF
+                # branchée dessus) continue, on attend le lecteur suivant
+                print("[BRIDGE] Lecteur déconnecté, attente d'un nouveau lecteur.")
+                self.sink.disconnect()
+                self.stats["deconnexions"] += 1
+                continue
+            if not self.running:
+                break
+            latency = time.monotonic() - t_first
+            self.latencies.append(latency)
+            metrics.capture_latency.observe(latency)
+            self.stats["envoyees"] += 1
+
+    def report(self):
+        report = dict(self.stats)
+        if self.latencies:
+            lat = np.array(self.latencies) * 1000
+            report.update({"latence_p50_ms": float(np.percentile(lat, 50)),
+                           "latence_p95_ms": float(np.percentile(lat, 95)),
+                           "latence_max_ms": float(lat.max())})
+        return report
+
+# -------------------------------------------------------
+# ESSAI AVEC UN LECTEUR LOCAL
+def _local_reader(path, frame_bytes, delay_s, stop):
+    """Remplace baresip : lit des trames, avec un retard optionnel par trame."""
+    while not os.path.exists(path):
+        time.sleep(0.01)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.connect(path)
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, frame_bytes)
+        while not stop.is_set():
+            if not s.recv(frame_bytes):
+                break
+            if delay_s:
+                time.sleep(delay_s)
+
+def demo():
+    """Compare un lecteur rapide et un lecteur lent, avec l'ADC simulé."""
+    for label, delay in (("lecteur rapide", 0.0), ("lecteur lent (30 ms/trame)", 0.03)):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "mic.sock")
+            bridge = AudioBridge(FakeADC(), SocketSink(path))
+            stop = threading.Event()
+            reader = threading.Thread(target=_local_reader,
+                                      args=(path, 2 * FRAME_SIZE, delay, stop), daemon=True)
+            reader.start()
+            bridge.start()
+            time.sleep(3)
+            stop.set()
+            bridge.stop()
+        print_report(f"[BRIDGE] {label} :", bridge.report())
+
+def print_report(title, report):
+    print(title)
+    for key, value in report.items():
+        print(f"           {key:16s} {value:.1f}" if isinstance(value, float)
+              else f"           {key:16s} {value}")
+
+# -------------------------------------------------------
+# PROGRAMME PRINCIPAL
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pont micro MCP3008 -> baresip")
+    parser.add_argument("--fake", action="store_true", help="ADC simulé au lieu du MCP3008")
+    parser.add_argument("--socket", action="store_true",
+                        help="socket Unix au lieu du tube nommé")
+    parser.add_argument("--path", default=PIPE_PATH)
+    parser.add_argument("--law", choices=("ulaw", "alaw"), help="sortie G.711 au lieu de s16le")
+    parser.add_argument("--duration", type=float, default=0,
+                        help="durée en secondes (0 : jusqu'à Ctrl-C)")
+    parser.add_argument("--demo", action="store_true", help="essai avec un lecteur local")
+    args = parser.parse_args()
+
+    if args.demo:
+        demo()
+    else:
+        metrics.start_exporters()
+        adc = FakeADC() if args.fake else SpiADC()
+        sink = SocketSink(args.path) if args.socket else FifoSink(args.path)
+        bridge = AudioBridge(adc, sink, law=args.law)
+        bridge.start()
+        print(f"[BRIDGE] Capture vers {args.path}.")
+        try:
+            start = time.monotonic()
+            while bridge.running and (not args.duration
+                                      or time.monotonic() - start < args.duration):
+                time.sleep(0.2)
+        except KeyboardInterrupt:
+            print("[BRIDGE] Interruption clavier.")
+        finally:
+            bridge.stop()
+        print_report("[BRIDGE] Bilan :", bridge.report())
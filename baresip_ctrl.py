@@ -3,8 +3,14 @@ import socket
 import time
 import os
 import threading
+import queue
 import json
 
+import metrics
+from audio_bridge import AudioBridge, FifoSink, SpiADC
+from dtmf import DTMFDetector
+from hook_switch import HookSwitch, OFF_HOOK, ON_HOOK
+
 # -------------------------------------------------------
 # CONFIG BARESIP (TCP)
 HOST = '127.0.0.1'
@@ -52,6 +58,7 @@ ring_active = False
 def ring_loop():
     """Boucle sonnerie tant que ring_active est True."""
     try:
+        t_phase = time.monotonic()
         while ring_active:
             set_pwm(PWM0_PATH, "normal")
             set_pwm(PWM1_PATH, "inversed")
@@ -59,8 +66,15 @@ def ring_loop():
             time.sleep(1.5)
             disable_pwm(PWM0_PATH)
             disable_pwm(PWM1_PATH)
+            # Écart de cadence : durée réelle de la phase - durée nominale
+            now = time.monotonic()
+            metrics.ring_cadence_error.observe(abs(now - t_phase - 1.5))
+            t_phase = now
             print("[RINGER] Pause...")
             time.sleep(3)
+            now = time.monotonic()
+            metrics.ring_cadence_error.observe(abs(now - t_phase - 3))
+            t_phase = now
     finally:
         disable_pwm(PWM0_PATH)
         disable_pwm(PWM1_PATH)
@@ -69,22 +83,58 @@ def ring_loop():
 # -------------------------------------------------------
 # ÉTAT DE L'APPEL
 call_active = False
+off_hook    = False
+dial_buffer = ""
 
-def auto_answer(s):
-    global ring_active
-    """Attend 8s après CALL_INCOMING, puis décroche si toujours en sonnerie."""
-    time.sleep(4)
-    if ring_active:
-        print("[AUTO] Décroche automatiquement.")
-        send_command(s,"/answer")
-        ring_active = False
+# File d'événements unique : messages Baresip et changements du combiné
+events = queue.Queue()
+
+def on_hook_change(state, t_edge):
+    """Callback du combiné (thread d'interruption) : poste l'événement."""
+    events.put(("HOOK", state, t_edge))
+
+def on_dtmf_digit(digit):
+    """Callback du détecteur DTMF (thread de capture) : poste le chiffre."""
+    events.put(("DTMF", digit, time.monotonic()))
+
+def parse_netstrings(buffer):
+    """
+    Découpe les netstrings complètes ("<len>:<données>,") en tête de buffer.
+    Renvoie (messages, reste) ; le reste est une netstring incomplète à
+    compléter avec la suite du flux.
+    """
+    messages = []
+    pos = 0
+    while True:
+        colon = buffer.find(b":", pos)
+        if colon < 0:
+            break
+        header = buffer[pos:colon]
+        if not header.isdigit():
+            print("[MAIN] Netstring invalide, tampon ignoré.")
+            return messages, b""
+        end = colon + 1 + int(header)
+        if end >= len(buffer):
+            break
+        if buffer[end] != ord(","):
+            print("[MAIN] Netstring invalide, tampon ignoré.")
+            return messages, b""
+        messages.append(buffer[colon + 1:end])
+        pos = end + 1
+    return messages, buffer[pos:]
 
-def auto_hangup(s):
-    """Attend 8s après CALL_ESTABLISHED, puis raccroche si toujours en appel."""
-    time.sleep(8)
-    if call_active:
-        print("[AUTO] Raccroche automatiquement.")
-        send_command(s,"/hangup")
+def baresip_reader(s):
+    """Lit le socket Baresip et poste chaque message dans la file."""
+    buffer = b""
+    while True:
+        data = s.recv(4096)
+        if not data:
+            break
+        messages, buffer = parse_netstrings(buffer + data)
+        now = time.monotonic()
+        for message in messages:
+            events.put(("BARESIP", message.decode(errors='replace'), now))
+    events.put(("CLOSED", None, time.monotonic()))
 
 def send_command(s, cmd_str,params=""):
 
@@ -104,49 +154,100 @@ def send_command(s, cmd_str,params=""):
     s.sendall(netstring.encode())
 
 # -------------------------------------------------------
-# INITIALISATION PWM
-init_pwm(PWM0_PATH, PERIOD_NS, DUTY_NS)
-init_pwm(PWM1_PATH, PERIOD_NS, DUTY_NS)
+# TRAITEMENT DES ÉVÉNEMENTS
+def dispatch(s, source, message, t_event):
+    """Traite un événement de la file (Baresip, combiné ou DTMF)."""
+    global ring_active, call_active, off_hook, dial_buffer
+
+    if source == "HOOK":
+        off_hook = message == OFF_HOOK
+        dial_buffer = ""
+        # Décroché pendant la sonnerie : on répond
+        if message == OFF_HOOK and ring_active:
+            print("[HOOK] Combiné décroché, on répond.")
+            send_command(s, "/answer")
+            metrics.event_latency.observe(time.monotonic() - t_event)
+            ring_active = False
+        # Raccroché pendant l'appel : on termine
+        elif message == ON_HOOK and call_active:
+            print("[HOOK] Combiné raccroché, on termine l'appel.")
+            send_command(s, "/hangup")
+            metrics.event_latency.observe(time.monotonic() - t_event)
+        return
+
+    if source == "DTMF":
+        # Numérotation combiné décroché, hors appel : '#' compose
+        if off_hook and not call_active and not ring_active:
+            if message == "#":
+                if dial_buffer:
+                    print(f"[DTMF] Compose {dial_buffer}.")
+                    send_command(s, "/dial", dial_buffer)
+                    metrics.event_latency.observe(time.monotonic() - t_event)
+                dial_buffer = ""
+            elif message == "*":
+                dial_buffer = ""
+            else:
+                dial_buffer += message
+        return
+
+    # Appel entrant
+    if "CALL_INCOMING" in message:
+        print("[EVENT] Appel entrant !")
+        ring_active = True
+        call_active = False
+        # Lance la sonnerie
+        threading.Thread(target=ring_loop, daemon=True).start()
+
+    # Appel établi
+    if "CALL_ESTABLISHED" in message or "200" in message:
+        print("[EVENT] Appel décroché (établi).")
+        # Stoppe la sonnerie
+        ring_active = False
+        # Active le flag d'appel
+        call_active = True
+
+    # Fin d’appel
+    if "CALL_CLOSED" in message or "CALL_TERMINATED" in message:
+        print("[EVENT] Fin d’appel.")
+        ring_active = False
+        call_active = False
 
 def main():
-    global ring_active, call_active
+    global off_hook
+
+    # INITIALISATION PWM
+    init_pwm(PWM0_PATH, PERIOD_NS, DUTY_NS)
+    init_pwm(PWM1_PATH, PERIOD_NS, DUTY_NS)
 
     print("[MAIN] Connexion à Baresip (TCP).")
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
         s.connect((HOST, PORT))
         print(f"[MAIN] Connecté sur {HOST}:{PORT}.")
 
-        while True:
-            data = s.recv(1024)
-            if not data:
-                break
-            message = data.decode(errors='replace')
-
-            # Appel entrant
-            if "CALL_INCOMING" in message:
-                print("[EVENT] Appel entrant !")
-                ring_active = True
-                call_active = False
-                # Lance la sonnerie
-                threading.Thread(target=ring_loop, daemon=True).start()
-                # Lance auto_answer dans 8s
-                threading.Thread(target=auto_answer, args=(s,), daemon=True).start()
-
-            # Appel établi
-            if "CALL_ESTABLISHED" in message or "200" in message:
-                print("[EVENT] Appel décroché (établi).")
-                # Stoppe la sonnerie
-                ring_active = False
-                # Active le flag d'appel
-                call_active = True
-                # Lance auto_hangup dans 8s
-                threading.Thread(target=auto_hangup, args=(s,), daemon=True).start()
-
-            # Fin d’appel
-            if "CALL_CLOSED" in message or "CALL_TERMINATED" in message:
-                print("[EVENT] Fin d’appel.")
-                ring_active = False
-                call_active = False
+        threading.Thread(target=baresip_reader, args=(s,), daemon=True).start()
+        hook = HookSwitch(on_hook_change)
+        hook.start()
+        # Combiné déjà décroché au démarrage : la numérotation est possible
+        off_hook = hook.state == OFF_HOOK
+        # Micro -> baresip, avec détection DTMF sur la même capture
+        # (trames int16, le détecteur attend des float dans [-1, 1])
+        detector = DTMFDetector(callback=on_dtmf_digit)
+        bridge = AudioBridge(SpiADC(), FifoSink(),
+                             listeners=[lambda pcm: detector.feed(pcm / 32768.0)])
+        bridge.start()
+        metrics.start_exporters()
+        print(f"[MAIN] Combiné : {hook.state}.")
+
+        try:
+            while True:
+                source, message, t_event = events.get()
+                if source == "CLOSED":
+                    break
+
+                dispatch(s, source, message, t_event)
+        finally:
+            bridge.stop()
+            hook.stop()
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,501 @@
+#!/usr/bin/env python3
+"""
+Banc de mesure reproductible des chemins critiques audio, SPI et contrôle.
+
+Chaque mesure appelle le code réel des scripts (AudioToPWM, IIViLa,
+SpiADC du pont audio, modules du contrôleur) sur des remplaçants simulés
+(sysfs PWM dans un dossier temporaire ; spidev, RPi.GPIO et pyaudio
+factices installés dans sys.modules ; socket baresip factice), avec des
+entrées fixes (graines aléatoires constantes) :
+  - conversion duty, boucle d'écriture sysfs, lecture WAV/MP3, accord joué,
+  - capture SPI + décodage, chaîne DSP, DTMF, G.711, annulation d'écho,
+    tampon de gigue,
+  - netstrings baresip (lecture / envoi) et traitement des événements.
+
+Pour chaque mesure : débit (éléments/s), percentiles de latence par appel
+et pic mémoire (tracemalloc, passe séparée pour ne pas fausser le temps).
+Les résultats sont écrits en JSON et comparés à une référence enregistrée
+(--save-baseline) : toute régression au-delà de la tolérance, ou une
+référence absente, fait échouer le script (code de sortie 1).
+"""
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import re
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+import wave
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "AudioTests"))
+
+import audio_bridge
+import baresip_ctrl
+import capture_dsp
+import dtmf
+import echo_canceller
+import g711
+import jitter_buffer
+from hook_switch import FakeGPIO, OFF_HOOK, ON_HOOK
+from pwm_calibration import DutyWriter, fake_pwm_dir
+
+# -------------------------------------------------------
+# CONFIG
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_PATH  = os.path.join(BENCH_DIR, "bench_results.json")
+BASELINE_PATH = os.path.join(BENCH_DIR, "bench_baseline.json")
+TOLERANCE = 0.25       # Écart toléré par rapport à la référence
+WARMUP = 5
+ROUNDS = 3             # Le débit retenu est celui de la meilleure manche (médiane)
+SEED = 1234
+MP3_FILE = os.path.join(BENCH_DIR, "AudioTests", "Sardines.mp3")
+
+DUTY_MAX = 25000       # Même valeur que les lecteurs à 40 kHz
+BLOCK = 160            # Trame de 20 ms à 8 kHz
+
+_benchmarks = []
+# Dossiers temporaires et descripteurs des mesures, libérés en fin de banc
+_cleanup = contextlib.ExitStack()
+
+def benchmark(name, repeat=200):
+    """Enregistre une mesure : la fonction décorée renvoie (op, éléments par appel)."""
+    def register(setup):
+        _benchmarks.append((name, setup, repeat))
+        return setup
+    return register
+
+# -------------------------------------------------------
+# REMPLAÇANTS SIMULÉS
+def _tempdir():
+    return _cleanup.enter_context(tempfile.TemporaryDirectory(prefix="bench_"))
+
+def _duty_writer(mode):
+    writer = DutyWriter(fake_pwm_dir(_tempdir()), mode)
+    _cleanup.callback(writer.close)
+    return writer
+
+class FakeSpiDev:
+    """spidev.SpiDev simulé : MCP3008 renvoyant une sinusoïde autour de 512."""
+
+    def __init__(self):
+        self.max_speed_hz = 0
+        self.mode = 0
+        self.no_cs = False
+        self._codes = (512 + 300 * np.sin(np.arange(1024) * 2 * np.pi / 32)).astype(int).tolist()
+        self._n = 0
+
+    def open(self, bus, device):
+        pass
+
+    def xfer2(self, cmd):
+        code = self._codes[self._n & 1023]
+        self._n += 1
+        return [0, (code >> 8) & 3, code & 0xFF]
+
+    def close(self):
+        pass
+
+
+class FakeSocket:
+    """Socket baresip simulé : compte les octets envoyés."""
+
+    def __init__(self):
+        self.sent = 0
+
+    def sendall(self, data):
+        self.sent += len(data)
+
+
+class FakePyAudio:
+    """pyaudio.PyAudio simulé (process_audio_file ne fait que l'ouvrir)."""
+
+    def terminate(self):
+        pass
+
+
+class NullDutyWriter:
+    """DutyWriter sans écriture : isole la conversion des lecteurs."""
+
+    def write(self, duty_ns):
+        pass
+
+    def close(self):
+        pass
+
+def _install_fakes():
+    """Remplace les modules matériels avant d'importer les scripts qui les utilisent."""
+    gpio = FakeGPIO()
+    rpi = types.ModuleType("RPi")
+    rpi.GPIO = gpio
+    sys.modules["RPi"] = rpi
+    sys.modules["RPi.GPIO"] = gpio
+    sys.modules["spidev"] = types.SimpleNamespace(SpiDev=FakeSpiDev)
+    sys.modules["pyaudio"] = types.SimpleNamespace(PyAudio=FakePyAudio)
+    try:
+        import pydub
+    except ImportError:
+        # Sans pydub, seule la mesure MP3 est ignorée
+        sys.modules["pydub"] = types.SimpleNamespace(AudioSegment=None)
+
+_install_fakes()
+import AudioToPWM
+import IIViLa
+
+# -------------------------------------------------------
+# SORTIE PWM
+@benchmark("duty_conversion_loop")
+def _duty_loop():
+    # Conversion de AudioToPWM (un bloc de process_audio_file), sans l'écriture
+    rng = np.random.default_rng(SEED)
+    data = rng.integers(-32768, 32768, 1024).astype('<i2').tobytes()
+    AudioToPWM.writer = NullDutyWriter()
+
+    def op():
+        for sample in AudioToPWM.normalize_samples(data):
+            AudioToPWM.update_duty_cycle(sample)
+    return op, len(data) // 2
+
+@benchmark("duty_conversion_g711_table")
+def _duty_table():
+    rng = np.random.default_rng(SEED)
+    data = g711.pcm_to_g711(rng.integers(-32768, 32768, 1024).astype(np.int16))
+
+    def op():
+        g711.g711_to_duty(data, DUTY_MAX)
+    return op, len(data)
+
+@benchmark("sysfs_write_reopen", repeat=50)
+def _sysfs_reopen():
+    writer = _duty_writer("reopen")
+
+    def op():
+        for i in range(256):
+            writer.write(i * 97)
+    return op, 256
+
+@benchmark("sysfs_write_fd", repeat=50)
+def _sysfs_fd():
+    writer = _duty_writer("fd")
+
+    def op():
+        for i in range(256):
+            writer.write(i * 97)
+    return op, 256
+
+@benchmark("jitter_buffer_frame")
+def _jitter():
+    jb = jitter_buffer.JitterBuffer()
+    frame = 0.3 * np.sin(np.arange(BLOCK) * 2 * np.pi / 20)
+    state = {"seq": 0}
+
+    def op():
+        seq = state["seq"]
+        jb.push(seq, frame, now=seq * jb.frame_s + 0.04)
+        jb.pull()
+        state["seq"] = seq + 1
+    return op, BLOCK
+
+# -------------------------------------------------------
+# LECTURE DE FICHIERS ET SYNTHÈSE
+@benchmark("wav_ingest", repeat=30)
+def _wav():
+    rng = np.random.default_rng(SEED)
+    path = os.path.join(_tempdir(), "bench.wav")
+    samples = rng.integers(-32768, 32768, 8000 * 2).astype('<i2')
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(8000)
+        wf.writeframes(samples.tobytes())
+    AudioToPWM.writer = NullDutyWriter()
+    sink = io.StringIO()
+
+    def op():
+        # Lecture complète par process_audio_file, sans cadencement ni écriture
+        with contextlib.redirect_stdout(sink):
+            AudioToPWM.process_audio_file(path, paced=False)
+        sink.seek(0)
+        sink.truncate()
+    return op, len(samples)
+
+@benchmark("mp3_ingest", repeat=3)
+def _mp3():
+    if AudioToPWM.AudioSegment is None or shutil.which("ffmpeg") is None \
+            or not os.path.exists(MP3_FILE):
+        return None
+    frames = int(AudioToPWM.AudioSegment.from_mp3(MP3_FILE).frame_count())
+    path = os.path.join(_tempdir(), "bench.wav")
+
+    def op():
+        AudioToPWM.convert_mp3_to_wav(MP3_FILE, path, 8000)
+    return op, frames
+
+@benchmark("chord_playback", repeat=30)
+def _synth():
+    # play_chord (IIViLa.py) sur le sysfs simulé : synthèse + écritures reopen
+    IIViLa.PWM_PATH = fake_pwm_dir(_tempdir())
+    notes = IIViLa.chords["II (Dm)"]
+    duration = 0.01
+
+    def op():
+        IIViLa.play_chord(notes, duration)
+    return op, int(IIViLa.f_pwm * duration)
+
+# -------------------------------------------------------
+# CAPTURE
+@benchmark("spi_capture_decode")
+def _spi():
+    # SpiADC.read_block du pont (read_adc de testRecordSPI.py, CS manuel
+    # compris), sans cadencement, sur spidev / GPIO simulés
+    adc = audio_bridge.SpiADC(realtime=False)
+    codes = np.empty(BLOCK, dtype=np.int16)
+
+    def op():
+        adc.read_block(codes)
+    return op, BLOCK
+
+@benchmark("capture_dsp_chain")
+def _dsp():
+    rng = np.random.default_rng(SEED)
+    codes = (540 + 20 * rng.standard_normal(BLOCK)).astype(np.int16)
+    chain = capture_dsp.default_chain()
+
+    def op():
+        chain.process_adc(codes)
+    return op, BLOCK
+
+@benchmark("dtmf_detect")
+def _dtmf():
+    signal = dtmf.synth_digits("0123456789", seed=SEED)
+    detector = dtmf.DTMFDetector()
+    state = {"pos": 0}
+
+    def op():
+        pos = state["pos"]
+        if pos + BLOCK > len(signal):
+            pos = 0
+        detector.feed(signal[pos:pos + BLOCK])
+        state["pos"] = pos + BLOCK
+    return op, BLOCK
+
+@benchmark("g711_encode_adc")
+def _g711_adc():
+    rng = np.random.default_rng(SEED)
+    codes = rng.integers(0, 1024, BLOCK)
+
+    def op():
+        g711.adc_to_g711(codes)
+    return op, BLOCK
+
+@benchmark("g711_decode")
+def _g711_dec():
+    rng = np.random.default_rng(SEED)
+    data = rng.integers(0, 256, BLOCK).astype(np.uint8).tobytes()
+
+    def op():
+        g711.g711_to_pcm(data)
+    return op, BLOCK
+
+@benchmark("echo_canceller_block")
+def _aec():
+    rng = np.random.default_rng(SEED)
+    n = BLOCK * 50
+    ref = 0.2 * rng.standard_normal(n)
+    mic = np.convolve(ref, echo_canceller.synthetic_echo_path(400, 20, 10.0))[:n]
+    aec = echo_canceller.EchoCanceller()
+    state = {"pos": 0}
+
+    def op():
+        pos = state["pos"] % n
+        aec.process(ref[pos:pos + BLOCK], mic[pos:pos + BLOCK])
+        state["pos"] = pos + BLOCK
+    return op, BLOCK
+
+# -------------------------------------------------------
+# CONTRÔLE BARESIP
+def _event_netstring(kind):
+    body = json.dumps({"event": True, "type": kind, "class": "call",
+                       "accountaor": "sip:pfe@localhost", "param": "sip:bob@localhost"})
+    return f"{len(body)}:{body},".encode()
+
+@benchmark("netstring_parse")
+def _ns_parse():
+    kinds = ("CALL_INCOMING", "CALL_RINGING", "CALL_ESTABLISHED", "CALL_CLOSED")
+    stream = b"".join(_event_netstring(kinds[i % 4]) for i in range(50))
+    # Coupé au milieu d'une netstring, comme un recv() réel
+    cut = len(stream) - 17
+
+    def op():
+        messages, rest = baresip_ctrl.parse_netstrings(stream[:cut])
+        baresip_ctrl.parse_netstrings(rest + stream[cut:])
+    return op, 50
+
+@benchmark("netstring_send_command")
+def _ns_send():
+    sock = FakeSocket()
+
+    def op():
+        for _ in range(50):
+            baresip_ctrl.send_command(sock, "/dial", "0612345678")
+    return op, 50
+
+@benchmark("event_dispatch")
+def _dispatch():
+    # Séquence sans CALL_INCOMING (qui lancerait le thread de sonnerie)
+    sock = FakeSocket()
+    sequence = [("BARESIP", '{"event":true,"type":"CALL_ESTABLISHED"}'),
+                ("HOOK", ON_HOOK),
+                ("BARESIP", '{"event":true,"type":"CALL_CLOSED"}'),
+                ("HOOK", OFF_HOOK),
+                ("DTMF", "1"), ("DTMF", "2"), ("DTMF", "#"),
+                ("HOOK", ON_HOOK)]
+    sink = io.StringIO()
+
+    def op():
+        with contextlib.redirect_stdout(sink):
+            for source, message in sequence:
+                baresip_ctrl.events.put((source, message, time.monotonic()))
+                source, message, t_event = baresip_ctrl.events.get()
+                baresip_ctrl.dispatch(sock, source, message, t_event)
+        sink.seek(0)
+        sink.truncate()
+    return op, len(sequence)
+
+# -------------------------------------------------------
+# EXÉCUTION
+def run_benchmark(name, setup, repeat):
+    prepared = setup()
+    if prepared is None:
+        return None
+    op, items = prepared
+    for _ in range(WARMUP):
+        op()
+
+    # Passes chronométrées, sans ramasse-miettes pour limiter le bruit ;
+    # la meilleure médiane des manches écarte les perturbations passagères
+    times = np.empty((ROUNDS, repeat))
+    for r in range(ROUNDS):
+        gc.collect()
+        gc.disable()
+        try:
+            for i in range(repeat):
+                t0 = time.perf_counter_ns()
+                op()
+                times[r, i] = time.perf_counter_ns() - t0
+        finally:
+            gc.enable()
+    best_median = float(np.median(times, axis=1).min())
+
+    # Passe mémoire séparée (tracemalloc ralentit l'exécution)
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    for _ in range(min(repeat, 5)):
+        op()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    times_us = times / 1000.0
+    return {
+        "items_per_call": items,
+        "calls": ROUNDS * repeat,
+        "throughput": items / (best_median / 1e9),
+        "p50_us": best_median / 1000.0,
+        "p95_us": float(np.percentile(times_us, 95)),
+        "p99_us": float(np.percentile(times_us, 99)),
+        "peak_kib": peak / 1024.0,
+    }
+
+def compare(results, baseline, tolerance, only=None):
+    """
+    Liste des régressions par rapport à la référence. Une mesure de la
+    référence absente ou ignorée dans ce passage (dépendance disparue,
+    mesure renommée) compte aussi comme régression, sauf si --only l'exclut.
+    """
+    regressions = []
+    for name, base in baseline.get("benchmarks", {}).items():
+        if base is None or (only and not re.search(only, name)):
+            continue
+        current = results.get(name)
+        if current is None:
+            regressions.append(f"{name} : présente dans la référence, "
+                               f"{'ignorée' if name in results else 'absente'} ici")
+            continue
+        if current["throughput"] < base["throughput"] * (1 - tolerance):
+            regressions.append(f"{name} : débit {current['throughput']:.0f}/s "
+                               f"< référence {base['throughput']:.0f}/s")
+        if current["p50_us"] > base["p50_us"] * (1 + tolerance):
+            regressions.append(f"{name} : p50 {current['p50_us']:.1f} µs "
+                               f"> référence {base['p50_us']:.1f} µs")
+        if current["peak_kib"] > base["peak_kib"] * (1 + tolerance) + 64:
+            regressions.append(f"{name} : mémoire {current['peak_kib']:.0f} Kio "
+                               f"> référence {base['peak_kib']:.0f} Kio")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Banc de mesure des chemins critiques")
+    parser.add_argument("--output", default=RESULTS_PATH)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="enregistre les résultats comme nouvelle référence")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--only", help="expression régulière sur le nom des mesures")
+    args = parser.parse_args()
+
+    np.random.seed(SEED)
+    results = {}
+    with _cleanup:
+        for name, setup, repeat in _benchmarks:
+            if args.only and not re.search(args.only, name):
+                continue
+            result = run_benchmark(name, setup, repeat)
+            results[name] = result
+            if result is None:
+                print(f"[BENCH] {name:28s} ignoré (dépendance absente)")
+            else:
+                print(f"[BENCH] {name:28s} {result['throughput']:14.0f} /s  "
+                      f"p50 {result['p50_us']:9.1f} µs  p99 {result['p99_us']:9.1f} µs  "
+                      f"pic {result['peak_kib']:8.1f} Kio")
+
+    report = {
+        "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "machine": platform.machine(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "benchmarks": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"[BENCH] Résultats : {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"[BENCH] Référence enregistrée : {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        # Sans référence, rien ne serait vérifié : on échoue plutôt que de passer
+        print(f"[BENCH] !!! Pas de référence ({args.baseline}) : "
+              f"l'enregistrer sur le Pi avec --save-baseline.")
+        return 1
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("machine") != report["machine"]:
+        print(f"[BENCH] Attention : référence mesurée sur {baseline.get('machine')}.")
+    regressions = compare(results, baseline, args.tolerance, args.only)
+    for line in regressions:
+        print(f"[BENCH] !!! RÉGRESSION {line}")
+    if regressions:
+        return 1
+    print("[BENCH] Aucune régression.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Chaîne de traitement par blocs pour l'audio capté par le MCP3008.
+
+Étages : suppression de la composante continue (IIR du 1er ordre),
+limitation à la bande voix (passe-haut 300 Hz + passe-bas 3400 Hz) et
+contrôle automatique de gain (attaque / relâchement).
+
+Les filtres IIR sont appliqués bloc par bloc sous forme d'état : pour un
+bloc de N échantillons, la sortie vaut H @ x + O @ s (H = réponse
+impulsionnelle sur le bloc, s = état du filtre en fin de bloc précédent).
+Le calcul est exact, vectorisé, et tous les tampons sont préalloués :
+aucun tableau n'est créé pendant process().
+"""
+import time
+import numpy as np
+
+# -------------------------------------------------------
+# CONFIG
+SAMPLE_RATE = 8000
+BLOCK_SIZE  = 160      # 20 ms à 8 kHz
+ADC_MID     = 512      # Code MCP3008 du silence théorique (10 bits)
+
+DC_POLE     = 0.995    # Pôle du bloqueur de continu (~6 Hz à 8 kHz)
+HP_FREQ     = 300.0    # Bande voix téléphonique
+LP_FREQ     = 3400.0
+
+AGC_TARGET  = 0.25     # Niveau crête visé (pleine échelle = 1.0)
+AGC_MAX_GAIN = 30.0    # ~ +30 dB au maximum
+AGC_ATTACK_MS  = 5.0
+AGC_RELEASE_MS = 300.0
+
+# -------------------------------------------------------
+# COEFFICIENTS
+def butter_biquad(kind, freq, sample_rate=SAMPLE_RATE, q=0.7071):
+    """Coefficients (b, a) d'un biquad passe-haut/passe-bas (RBJ cookbook)."""
+    w0 = 2 * np.pi * freq / sample_rate
+    cos_w0 = np.cos(w0)
+    alpha = np.sin(w0) / (2 * q)
+    if kind == "highpass":
+        b = [(1 + cos_w0) / 2, -(1 + cos_w0), (1 + cos_w0) / 2]
+    elif kind == "lowpass":
+        b = [(1 - cos_w0) / 2, 1 - cos_w0, (1 - cos_w0) / 2]
+    else:
+        raise ValueError(f"Type de filtre inconnu : {kind}")
+    a = [1 + alpha, -2 * cos_w0, 1 - alpha]
+    return [c / a[0] for c in b], [c / a[0] for c in a]
+
+# -------------------------------------------------------
+# ÉTAGES
+class IIRStage:
+    """Filtre IIR d'ordre 2 (ou 1 avec b2 = a2 = 0) appliqué par blocs."""
+
+    def __init__(self, b, a, block_size=BLOCK_SIZE, name="iir"):
+        self.name = name
+        b = list(b) + [0.0] * (3 - len(b))
+        a = list(a) + [0.0] * (3 - len(a))
+        b0, b1, b2 = (c / a[0] for c in b)
+        _, a1, a2 = (c / a[0] for c in a)
+        # Forme directe II transposée : s' = A s + B x ; y = C s + D x
+        A = np.array([[-a1, 1.0], [-a2, 0.0]])
+        B = np.array([b1 - a1 * b0, b2 - a2 * b0])
+        C = np.array([1.0, 0.0])
+
+        n = block_size
+        powers = [np.eye(2)]
+        for _ in range(n):
+            powers.append(A @ powers[-1])
+        # h[k] = C A^(k-1) B pour k >= 1, h[0] = D
+        h = np.empty(n)
+        h[0] = b0
+        for k in range(1, n):
+            h[k] = C @ powers[k - 1] @ B
+        idx = np.arange(n)
+        lag = idx[:, None] - idx[None, :]
+        self.H = np.where(lag >= 0, h[np.clip(lag, 0, n - 1)], 0.0)
+        self.O = np.array([C @ powers[k] for k in range(n)])              # (n, 2)
+        self.AN = powers[n]                                                # (2, 2)
+        self.S = np.array([powers[n - 1 - k] @ B for k in range(n)]).T     # (2, n)
+
+        self.state = np.zeros(2)
+        self._tmp = np.empty(n)
+        self._s_tmp = np.empty(2)
+
+    def reset(self):
+        self.state[:] = 0.0
+
+    def process(self, x, out):
+        np.matmul(self.H, x, out=out)
+        np.matmul(self.O, self.state, out=self._tmp)
+        out += self._tmp
+        # État en fin de bloc
+        np.matmul(self.AN, self.state, out=self._s_tmp)
+        np.matmul(self.S, x, out=self.state)
+        self.state += self._s_tmp
+        return out
+
+
+class DCBlocker(IIRStage):
+    """y[n] = x[n] - x[n-1] + R y[n-1]"""
+
+    def __init__(self, pole=DC_POLE, block_size=BLOCK_SIZE):
+        super().__init__([1.0, -1.0], [1.0, -pole], block_size, name="dc")
+
+
+class VoiceBand:
+    """Passe-haut puis passe-bas : bande 300-3400 Hz."""
+
+    def __init__(self, low=HP_FREQ, high=LP_FREQ, sample_rate=SAMPLE_RATE,
+                 block_size=BLOCK_SIZE):
+        self.name = "bande"
+        self.hp = IIRStage(*butter_biquad("highpass", low, sample_rate), block_size)
+        self.lp = IIRStage(*butter_biquad("lowpass", high, sample_rate), block_size)
+        self._mid = np.empty(block_size)
+
+    def reset(self):
+        self.hp.reset()
+        self.lp.reset()
+
+    def process(self, x, out):
+        self.hp.process(x, self._mid)
+        return self.lp.process(self._mid, out)
+
+
+class AGC:
+    """
+    Contrôle automatique de gain sur l'enveloppe crête de chaque bloc.
+    L'enveloppe monte avec la constante d'attaque et redescend avec celle
+    de relâchement ; le gain est interpolé linéairement sur le bloc pour
+    éviter les sauts.
+    """
+
+    def __init__(self, target=AGC_TARGET, max_gain=AGC_MAX_GAIN,
+                 attack_ms=AGC_ATTACK_MS, release_ms=AGC_RELEASE_MS,
+                 sample_rate=SAMPLE_RATE, block_size=BLOCK_SIZE):
+        self.name = "agc"
+        self.target = target
+        self.max_gain = max_gain
+        block_s = block_size / sample_rate
+        self.attack = np.exp(-block_s / (attack_ms / 1000.0))
+        self.release = np.exp(-block_s / (release_ms / 1000.0))
+        self.env = 0.0
+        self.gain = 1.0
+        self._ramp = np.arange(1, block_size + 1) / block_size
+        self._gains = np.empty(block_size)
+
+    def reset(self):
+        self.env = 0.0
+        self.gain = 1.0
+
+    def process(self, x, out):
+        np.abs(x, out=self._gains)
+        peak = float(self._gains.max())
+        coef = self.attack if peak > self.env else self.release
+        self.env = coef * self.env + (1 - coef) * peak
+        new_gain = min(self.max_gain, self.target / max(self.env, 1e-6))
+        # Rampe de l'ancien au nouveau gain
+        np.multiply(self._ramp, new_gain - self.gain, out=self._gains)
+        self._gains += self.gain
+        np.multiply(x, self._gains, out=out)
+        np.clip(out, -1.0, 1.0, out=out)
+        self.gain = new_gain
+        return out
+
+# -------------------------------------------------------
+# CHAÎNE
+class DSPChain:
+    """
+    Enchaîne des étages process(x, out) sur des blocs de taille fixe, en
+    alternant deux tampons préalloués. Le temps passé dans chaque étage
+    est cumulé pour report().
+    """
+
+    def __init__(self, stages, block_size=BLOCK_SIZE, sample_rate=SAMPLE_RATE):
+        self.stages = stages
+        self.block_size = block_size
+        self.block_s = block_size / sample_rate
+        self._in = np.empty(block_size)
+        self._bufs = (np.empty(block_size), np.empty(block_size))
+        self._scaled = np.empty(block_size)
+        self._pcm = np.empty(block_size, dtype=np.int16)
+        self.cost_ns = [0] * len(stages)
+        self.blocks = 0
+
+    def reset(self):
+        for stage in self.stages:
+            stage.reset()
+        self.cost_ns = [0] * len(self.stages)
+        self.blocks = 0
+
+    def process(self, x):
+        """Traite un bloc float ; le tableau renvoyé est réutilisé au bloc suivant."""
+        src = x
+        for i, stage in enumerate(self.stages):
+            dst = self._bufs[i % 2]
+            t0 = time.perf_counter_ns()
+            stage.process(src, dst)
+            self.cost_ns[i] += time.perf_counter_ns() - t0
+            src = dst
+        self.blocks += 1
+        return src
+
+    def process_adc(self, codes):
+        """Bloc de codes 10 bits du MCP3008 -> bloc PCM int16."""
+        np.subtract(codes, ADC_MID, out=self._in)
+        self._in *= 1.0 / ADC_MID
+        np.multiply(self.process(self._in), 32767.0, out=self._scaled)
+        np.copyto(self._pcm, self._scaled, casting='unsafe')
+        return self._pcm
+
+    def report(self):
+        """Coût moyen par étage : µs/bloc et part du budget temps réel."""
+        lines = []
+        for stage, ns in zip(self.stages, self.cost_ns):
+            us = ns / max(self.blocks, 1) / 1000.0
+            lines.append((stage.name, us, 100.0 * us / (self.block_s * 1e6)))
+        return lines
+
+
+def default_chain(block_size=BLOCK_SIZE, sample_rate=SAMPLE_RATE):
+    """Chaîne de capture standard : continu -> bande voix -> AGC."""
+    return DSPChain([DCBlocker(block_size=block_size),
+                     VoiceBand(sample_rate=sample_rate, block_size=block_size),
+                     AGC(sample_rate=sample_rate, block_size=block_size)],
+                    block_size, sample_rate)
+
+# -------------------------------------------------------
+# BANC D'ESSAI
+if __name__ == "__main__":
+    # Micro faible et décalé : 1 kHz à ±20 codes autour de 540
+    rng = np.random.default_rng(0)
+    t = np.arange(SAMPLE_RATE * 10) / SAMPLE_RATE
+    codes = np.round(540 + 20 * np.sin(2 * np.pi * 1000 * t)
+                     + 2 * rng.standard_normal(len(t))).astype(np.int16)
+
+    chain = default_chain()
+    out = np.empty(len(codes), dtype=np.int16)
+    for i in range(0, len(codes) - BLOCK_SIZE + 1, BLOCK_SIZE):
+        out[i:i + BLOCK_SIZE] = chain.process_adc(codes[i:i + BLOCK_SIZE])
+
+    naive = (codes / 1023.0 * 65535).astype(np.int32) - 32768
+    tail = slice(len(out) // 2, None)
+    print(f"[DSP] Conversion linéaire : moyenne {naive[tail].mean():.0f}, "
+          f"crête {np.abs(naive[tail] - naive[tail].mean()).max():.0f}")
+    print(f"[DSP] Chaîne : moyenne {out[tail].mean():.0f}, "
+          f"crête {np.abs(out[tail]).max():.0f}")
+    for name, us, load in chain.report():
+        print(f"[DSP] {name:6s} {us:7.1f} µs/bloc  {load:5.2f} % du temps réel")
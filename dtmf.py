@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Détection DTMF en flux sur l'audio capté par le MCP3008.
+
+Les échantillons sont découpés en blocs fixes de BLOCK_SIZE (205 à 8 kHz,
+taille classique pour le DTMF). Pour chaque bloc, le banc de Goertzel des
+8 fréquences DTMF est évalué d'un coup : la sortie d'un Goertzel est le
+terme de DFT à la fréquence visée, donc tous les blocs disponibles sont
+traités par un seul produit matriciel NumPy (blocs x coefficients).
+"""
+import sys
+import time
+import numpy as np
+
+# -------------------------------------------------------
+# CONFIG DTMF
+SAMPLE_RATE = 8000
+BLOCK_SIZE  = 205
+
+ROW_FREQS = (697, 770, 852, 941)
+COL_FREQS = (1209, 1336, 1477, 1633)
+KEYS = ("123A",
+        "456B",
+        "789C",
+        "*0#D")
+
+MIN_POWER      = 1e-4  # Puissance moyenne minimale du bloc (signal normalisé)
+MIN_TONE_RATIO = 0.5   # Part de l'énergie du bloc portée par les deux tons
+MIN_PEAK_RATIO = 6.3   # Ton dominant >= 8 dB au-dessus des autres du groupe
+MAX_TWIST_DB     = 8.0 # Colonne plus faible que la ligne (twist normal)
+MAX_REV_TWIST_DB = 4.0 # Ligne plus faible que la colonne (twist inverse)
+MIN_BLOCKS     = 2     # Blocs consécutifs nécessaires pour valider un chiffre
+
+# -------------------------------------------------------
+# DÉTECTEUR
+class DTMFDetector:
+    """
+    Détecteur DTMF en flux : feed() accepte des blocs de taille quelconque
+    et renvoie la liste des chiffres validés ; callback(digit) est aussi
+    appelé pour chacun s'il est fourni.
+    """
+
+    def __init__(self, callback=None, sample_rate=SAMPLE_RATE, block_size=BLOCK_SIZE):
+        self.callback = callback
+        self.block_size = block_size
+        freqs = np.array(ROW_FREQS + COL_FREQS, dtype=np.float64)
+        n = np.arange(block_size)
+        # Coefficients du banc de Goertzel, un vecteur par fréquence
+        self.bank = np.exp(-2j * np.pi * np.outer(n, freqs) / sample_rate)
+        self._pending = np.zeros(block_size, dtype=np.float64)
+        self._fill = 0
+        self._candidate = None
+        self._count = 0
+        self._emitted = None
+
+    def reset(self):
+        self._fill = 0
+        self._candidate = None
+        self._count = 0
+        self._emitted = None
+
+    def feed(self, samples):
+        """Ajoute des échantillons (float centrés sur 0) et traite les blocs complets."""
+        samples = np.asarray(samples, dtype=np.float64)
+        digits = []
+        # Compléter le bloc en attente
+        if self._fill:
+            take = min(self.block_size - self._fill, len(samples))
+            self._pending[self._fill:self._fill + take] = samples[:take]
+            self._fill += take
+            samples = samples[take:]
+            if self._fill < self.block_size:
+                return digits
+            self._fill = 0
+            digits += self._process(self._pending[np.newaxis, :])
+        # Tous les blocs complets d'un coup
+        n_blocks = len(samples) // self.block_size
+        if n_blocks:
+            blocks = samples[:n_blocks * self.block_size].reshape(n_blocks, self.block_size)
+            digits += self._process(blocks)
+        rest = samples[n_blocks * self.block_size:]
+        self._pending[:len(rest)] = rest
+        self._fill = len(rest)
+        return digits
+
+    def _process(self, blocks):
+        blocks = blocks - blocks.mean(axis=1, keepdims=True)
+        energy = np.einsum('ij,ij->i', blocks, blocks)
+        # Puissance de chaque ton, ramenée à l'échelle de l'énergie du bloc
+        powers = np.abs(blocks @ self.bank) ** 2 * (2.0 / self.block_size)
+        digits = []
+        for e, p in zip(energy, powers):
+            digit = self._classify(e, p)
+            if digit is not None and digit == self._candidate:
+                self._count += 1
+            else:
+                self._candidate = digit
+                self._count = 1
+            if self._candidate is None:
+                self._emitted = None
+            elif self._count >= MIN_BLOCKS and self._candidate != self._emitted:
+                self._emitted = self._candidate
+                digits.append(self._candidate)
+                if self.callback is not None:
+                    self.callback(self._candidate)
+        return digits
+
+    def _classify(self, energy, powers):
+        if energy < MIN_POWER * self.block_size:
+            return None
+        rows, cols = powers[:4], powers[4:]
+        r, c = int(np.argmax(rows)), int(np.argmax(cols))
+        row_p, col_p = rows[r], cols[c]
+        # Énergie : les deux tons doivent dominer le bloc
+        if row_p + col_p < MIN_TONE_RATIO * energy:
+            return None
+        # Un seul ton net par groupe
+        if np.sort(rows)[-2] * MIN_PEAK_RATIO > row_p:
+            return None
+        if np.sort(cols)[-2] * MIN_PEAK_RATIO > col_p:
+            return None
+        # Twist : écart de niveau entre ligne et colonne
+        twist_db = 10 * np.log10(row_p / col_p)
+        if twist_db > MAX_TWIST_DB or -twist_db > MAX_REV_TWIST_DB:
+            return None
+        return KEYS[r][c]
+
+# -------------------------------------------------------
+# SYNTHÈSE ET BANC D'ESSAI
+def synth_digits(digits, tone_ms=60, gap_ms=60, amplitude=0.25,
+                 noise=0.02, sample_rate=SAMPLE_RATE, seed=0):
+    """Génère une séquence DTMF bruitée (float, centrée sur 0)."""
+    rng = np.random.default_rng(seed)
+    tone_n = int(sample_rate * tone_ms / 1000)
+    gap_n = int(sample_rate * gap_ms / 1000)
+    t = np.arange(tone_n) / sample_rate
+    parts = [np.zeros(gap_n)]
+    for d in digits:
+        r = next(i for i, row in enumerate(KEYS) if d in row)
+        c = KEYS[r].index(d)
+        parts.append(amplitude * (np.sin(2 * np.pi * ROW_FREQS[r] * t)
+                                  + np.sin(2 * np.pi * COL_FREQS[c] * t)))
+        parts.append(np.zeros(gap_n))
+    signal = np.concatenate(parts)
+    return signal + noise * rng.standard_normal(len(signal))
+
+if __name__ == "__main__":
+    sequence = "0123456789*#ABCD"
+    signal = synth_digits(sequence)
+
+    # Détection par paquets de 160 échantillons (20 ms), comme en capture
+    detector = DTMFDetector()
+    found = []
+    for i in range(0, len(signal), 160):
+        found += detector.feed(signal[i:i + 160])
+    print("[DTMF] Envoyé :", sequence)
+    print("[DTMF] Détecté :", "".join(found))
+    if "".join(found) != sequence:
+        sys.exit("[DTMF] ÉCHEC : séquence détectée différente de la séquence envoyée")
+
+    # Débit en blocs/s et charge CPU équivalente à 8 kHz
+    bench = synth_digits(sequence * 20, seed=1)
+    detector.reset()
+    n_blocks = len(bench) // BLOCK_SIZE
+    start = time.perf_counter()
+    for i in range(0, len(bench), 160):
+        detector.feed(bench[i:i + 160])
+    elapsed = time.perf_counter() - start
+    rate = n_blocks / elapsed
+    print(f"[DTMF] {rate:.0f} blocs/s, charge à 8 kHz : "
+          f"{100 * SAMPLE_RATE / BLOCK_SIZE / rate:.2f} % d'un cœur")
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Annulation d'écho acoustique entre le haut-parleur PWM et le micro MCP3008.
+
+Filtre adaptatif NLMS dans le domaine fréquentiel, partitionné par blocs
+(PBFDAF, overlap-save) : le filtre de FILTER_LEN coefficients est découpé
+en P partitions de BLOCK_SIZE. À chaque bloc, une seule FFT du signal de
+référence est calculée ; les spectres des P blocs précédents sont gardés
+et réutilisés pour la sortie et l'adaptation. Le pas est normalisé par la
+puissance de la référence dans chaque raie (NLMS).
+
+Référence = les valeurs envoyées à la boucle de sortie PWM (duty_cycle),
+recentrées par duty_to_ref() ; signal micro = blocs issus de la capture.
+"""
+import time
+import numpy as np
+
+# -------------------------------------------------------
+# CONFIG
+SAMPLE_RATE = 8000
+BLOCK_SIZE  = 160      # 20 ms, comme la capture
+FILTER_LEN  = 1280     # 160 ms de trajet d'écho
+MU          = 0.5      # Pas d'adaptation (0 < mu < 1)
+POWER_BETA  = 0.9      # Lissage de la puissance de référence par raie
+
+# -------------------------------------------------------
+# ANNULEUR D'ÉCHO
+class EchoCanceller:
+    """process(ref, mic) renvoie le signal micro débarrassé de l'écho estimé."""
+
+    def __init__(self, block_size=BLOCK_SIZE, filter_len=FILTER_LEN, mu=MU,
+                 power_beta=POWER_BETA):
+        b = block_size
+        self.block_size = b
+        self.partitions = -(-filter_len // b)
+        self.mu = mu
+        self.beta = power_beta
+        n_bins = b + 1
+        self.W = np.zeros((self.partitions, n_bins), dtype=np.complex128)
+        self.X = np.zeros((self.partitions, n_bins), dtype=np.complex128)
+        self.power = np.zeros(n_bins)
+        self.x_buf = np.zeros(2 * b)
+        self.e_buf = np.zeros(2 * b)
+        self.e = np.zeros(b)
+        self.blocks = 0
+        self.cost_ns = 0
+
+    def reset(self):
+        self.W[:] = 0
+        self.X[:] = 0
+        self.power[:] = 0
+        self.x_buf[:] = 0
+        self.blocks = 0
+        self.cost_ns = 0
+
+    def process(self, ref, mic, adapt=True):
+        t0 = time.perf_counter_ns()
+        b = self.block_size
+
+        # Nouveau spectre de référence ; les anciens glissent d'une partition
+        self.x_buf[:b] = self.x_buf[b:]
+        self.x_buf[b:] = ref
+        self.X[1:] = self.X[:-1]
+        self.X[0] = np.fft.rfft(self.x_buf)
+
+        # Estimation de l'écho (overlap-save : on garde la 2e moitié)
+        Y = np.einsum('pk,pk->k', self.W, self.X)
+        echo = np.fft.irfft(Y, 2 * b)[b:]
+        np.subtract(mic, echo, out=self.e)
+
+        if adapt:
+            self.e_buf[b:] = self.e
+            E = np.fft.rfft(self.e_buf)
+            self.power *= self.beta
+            self.power += (1 - self.beta) * (self.X[0].real ** 2 + self.X[0].imag ** 2)
+            norm = self.partitions * self.power + 1e-10 * (2 * b)
+            G = np.conj(self.X) * (self.mu * E / norm)
+            # Contrainte de gradient : coefficients limités à b par partition
+            g = np.fft.irfft(G, 2 * b, axis=1)
+            g[:, b:] = 0
+            self.W += np.fft.rfft(g, axis=1)
+
+        self.blocks += 1
+        self.cost_ns += time.perf_counter_ns() - t0
+        return self.e
+
+
+def duty_to_ref(duty, duty_max):
+    """Valeurs duty_cycle (ns) envoyées au PWM -> référence centrée dans [-1, 1]."""
+    return np.asarray(duty, dtype=np.float64) * (2.0 / duty_max) - 1.0
+
+# -------------------------------------------------------
+# BANC D'ESSAI
+def synthetic_echo_path(length=800, delay=40, decay_ms=25.0, sample_rate=SAMPLE_RATE,
+                        gain=0.5, seed=0):
+    """Réponse d'écho synthétique : retard pur puis décroissance exponentielle."""
+    rng = np.random.default_rng(seed)
+    n = np.arange(length - delay)
+    h = rng.standard_normal(len(n)) * np.exp(-n / (decay_ms * sample_rate / 1000))
+    h *= gain / np.sqrt(np.sum(h ** 2))
+    return np.concatenate([np.zeros(delay), h])
+
+def erle_db(mic, err):
+    return 10 * np.log10(np.sum(mic ** 2) / max(np.sum(err ** 2), 1e-20))
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(1)
+    seconds = 10
+    n = SAMPLE_RATE * seconds
+    # Référence type parole : bruit coloré modulé en amplitude
+    white = rng.standard_normal(n)
+    colored = np.convolve(white, [1.0, 0.8, 0.5, 0.2], mode="same")
+    envelope = 0.5 + 0.5 * np.abs(np.sin(2 * np.pi * 1.5 * np.arange(n) / SAMPLE_RATE))
+    ref = 0.2 * colored * envelope
+
+    for label, h in (("trajet court (50 ms)", synthetic_echo_path(400, 20, 10.0)),
+                     ("trajet long (100 ms)", synthetic_echo_path(800, 40, 25.0, seed=2))):
+        mic = np.convolve(ref, h)[:n] + 1e-3 * rng.standard_normal(n)
+        aec = EchoCanceller()
+        err = np.empty(n)
+        for i in range(0, n - BLOCK_SIZE + 1, BLOCK_SIZE):
+            s = slice(i, i + BLOCK_SIZE)
+            err[s] = aec.process(ref[s], mic[s])
+        tail = slice(n - 2 * SAMPLE_RATE, n)
+        us = aec.cost_ns / aec.blocks / 1000
+        print(f"[AEC] {label} : ERLE {erle_db(mic[tail], err[tail]):.1f} dB "
+              f"(1re seconde {erle_db(mic[:SAMPLE_RATE], err[:SAMPLE_RATE]):.1f} dB), "
+              f"{us:.0f} µs/bloc, {100 * us / (BLOCK_SIZE / SAMPLE_RATE * 1e6):.2f} % du temps réel")
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Codec G.711 (µ-law / A-law) par tables précalculées.
+
+Toutes les conversions se font par indexation NumPy d'une table, bloc
+entier en une seule opération :
+  - codes 10 bits MCP3008 -> octets G.711  (table de 1024)
+  - PCM int16             -> octets G.711  (table de 65536)
+  - octets G.711          -> PCM int16     (table de 256)
+  - octets G.711          -> duty PWM (ns) (table de 256)
+Les tables sont construites à partir de l'algorithme de référence
+(g711.c de Sun / ITU-T G.191), reproduit ci-dessous en version scalaire.
+"""
+import sys
+import time
+import numpy as np
+
+ULAW = "ulaw"
+ALAW = "alaw"
+
+ADC_MID = 512          # Code MCP3008 du silence (10 bits)
+
+# -------------------------------------------------------
+# RÉFÉRENCE SCALAIRE (g711.c)
+_SEG_UEND = (0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF, 0x1FFF)
+_SEG_AEND = (0x1F, 0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF)
+_BIAS = 0x84
+_CLIP = 8159
+
+def _search(val, table):
+    for i, end in enumerate(table):
+        if val <= end:
+            return i
+    return len(table)
+
+def linear2ulaw(pcm):
+    pcm >>= 2
+    if pcm < 0:
+        pcm = -pcm
+        mask = 0x7F
+    else:
+        mask = 0xFF
+    pcm = min(pcm, _CLIP) + (_BIAS >> 2)
+    seg = _search(pcm, _SEG_UEND)
+    if seg >= 8:
+        return 0x7F ^ mask
+    return ((seg << 4) | ((pcm >> (seg + 1)) & 0xF)) ^ mask
+
+def ulaw2linear(u):
+    u = ~u & 0xFF
+    t = (((u & 0x0F) << 3) + _BIAS) << ((u & 0x70) >> 4)
+    return _BIAS - t if u & 0x80 else t - _BIAS
+
+def linear2alaw(pcm):
+    pcm >>= 3
+    if pcm >= 0:
+        mask = 0xD5
+    else:
+        mask = 0x55
+        pcm = -pcm - 1
+    seg = _search(pcm, _SEG_AEND)
+    if seg >= 8:
+        return 0x7F ^ mask
+    aval = seg << 4
+    aval |= ((pcm >> 1) if seg < 2 else (pcm >> seg)) & 0x0F
+    return aval ^ mask
+
+def alaw2linear(a):
+    a ^= 0x55
+    t = (a & 0x0F) << 4
+    seg = (a & 0x70) >> 4
+    if seg == 0:
+        t += 8
+    else:
+        t = (t + 0x108) << (seg - 1)
+    return t if a & 0x80 else -t
+
+# -------------------------------------------------------
+# TABLES
+def _build_decode(law):
+    """Table 256 -> int16, calculée d'un bloc."""
+    code = np.arange(256)
+    if law == ULAW:
+        u = ~code & 0xFF
+        t = (((u & 0x0F) << 3) + _BIAS) << ((u & 0x70) >> 4)
+        lin = np.where(u & 0x80, _BIAS - t, t - _BIAS)
+    else:
+        a = code ^ 0x55
+        t = (a & 0x0F) << 4
+        seg = (a & 0x70) >> 4
+        t = np.where(seg == 0, t + 8, (t + 0x108) << np.maximum(seg - 1, 0))
+        lin = np.where(a & 0x80, t, -t)
+    return lin.astype(np.int16)
+
+def _build_encode(law):
+    """Table indexée par le PCM int16 vu en uint16 (65536 entrées)."""
+    pcm = np.arange(65536, dtype=np.uint16).view(np.int16).astype(np.int32)
+    if law == ULAW:
+        val = pcm >> 2
+        mask = np.where(val < 0, 0x7F, 0xFF)
+        val = np.minimum(np.abs(val), _CLIP) + (_BIAS >> 2)
+        seg = np.searchsorted(_SEG_UEND, val)
+        quant = (val >> (seg + 1)) & 0x0F
+        out = np.where(seg >= 8, 0x7F ^ mask, ((seg << 4) | quant) ^ mask)
+    else:
+        val = pcm >> 3
+        mask = np.where(val >= 0, 0xD5, 0x55)
+        val = np.where(val >= 0, val, -val - 1)
+        seg = np.searchsorted(_SEG_AEND, val)
+        quant = np.where(seg < 2, val >> 1, val >> np.minimum(seg, 7)) & 0x0F
+        out = np.where(seg >= 8, 0x7F ^ mask, ((seg << 4) | quant) ^ mask)
+    return out.astype(np.uint8)
+
+DECODE = {ULAW: _build_decode(ULAW), ALAW: _build_decode(ALAW)}
+ENCODE = {ULAW: _build_encode(ULAW), ALAW: _build_encode(ALAW)}
+
+# Codes 10 bits recentrés sur 512 et mis à l'échelle 16 bits, puis encodés
+_ADC_PCM = ((np.arange(1024) - ADC_MID) << 6).astype(np.int16)
+ADC_ENCODE = {law: ENCODE[law][_ADC_PCM.view(np.uint16)] for law in (ULAW, ALAW)}
+
+_duty_tables = {}
+
+def duty_table(law, duty_max):
+    """Table 256 -> duty_cycle (ns), même normalisation que process_audio_file."""
+    key = (law, duty_max)
+    if key not in _duty_tables:
+        max_amplitude = 2**15 - 1
+        lin = DECODE[law].astype(np.float64)
+        normalized = (lin + max_amplitude) / (2 * max_amplitude)
+        _duty_tables[key] = (normalized * duty_max).astype(np.int64)
+    return _duty_tables[key]
+
+# -------------------------------------------------------
+# CONVERSIONS PAR BLOC
+def pcm_to_g711(pcm, law=ULAW):
+    """Bloc int16 -> octets G.711 (uint8)."""
+    return ENCODE[law][np.asarray(pcm, dtype=np.int16).view(np.uint16)]
+
+def g711_to_pcm(data, law=ULAW):
+    """Octets G.711 (bytes ou uint8) -> bloc int16."""
+    return DECODE[law][np.frombuffer(data, dtype=np.uint8)
+                       if isinstance(data, (bytes, bytearray)) else data]
+
+def adc_to_g711(codes, law=ULAW):
+    """Bloc de codes 10 bits MCP3008 -> octets G.711."""
+    return ADC_ENCODE[law][codes]
+
+def g711_to_duty(data, duty_max, law=ULAW):
+    """Octets G.711 -> valeurs de duty_cycle (ns) pour la sortie PWM."""
+    return duty_table(law, duty_max)[np.frombuffer(data, dtype=np.uint8)
+                                     if isinstance(data, (bytes, bytearray)) else data]
+
+# -------------------------------------------------------
+# VÉRIFICATION ET BANC D'ESSAI
+if __name__ == "__main__":
+    # Valeurs de référence ITU-T G.711 / G.191
+    known = [
+        (ulaw2linear, 0x00, -32124), (ulaw2linear, 0x7F, 0),
+        (ulaw2linear, 0x80, 32124), (ulaw2linear, 0xFF, 0),
+        (alaw2linear, 0xD5, 8), (alaw2linear, 0x55, -8),
+        (alaw2linear, 0xAA, 32256), (alaw2linear, 0x2A, -32256),
+        (linear2ulaw, 0, 0xFF), (linear2ulaw, 32767, 0x80), (linear2ulaw, -32768, 0x00),
+        (linear2alaw, 0, 0xD5), (linear2alaw, 32767, 0xAA), (linear2alaw, -32768, 0x2A),
+    ]
+    ok = all(f(x) == y for f, x, y in known)
+    print("[G711] Valeurs de référence :", ok)
+
+    pcm_all = np.arange(-32768, 32768)
+    for law, enc, dec in ((ULAW, linear2ulaw, ulaw2linear), (ALAW, linear2alaw, alaw2linear)):
+        enc_ok = np.array_equal(pcm_to_g711(pcm_all, law),
+                                [enc(int(x)) for x in pcm_all])
+        dec_ok = np.array_equal(DECODE[law], [dec(x) for x in range(256)])
+        print(f"[G711] {law} tables identiques à la référence : "
+              f"encodage {enc_ok}, décodage {dec_ok}")
+        ok = ok and enc_ok and dec_ok
+    if not ok:
+        sys.exit("[G711] ÉCHEC : tables différentes de la référence")
+
+    rng = np.random.default_rng(0)
+    pcm = rng.integers(-32768, 32768, 8000 * 60).astype(np.int16)
+    codes = rng.integers(0, 1024, len(pcm))
+    for name, func, arg in (("int16 -> G.711", pcm_to_g711, pcm),
+                            ("G.711 -> int16", g711_to_pcm, pcm_to_g711(pcm)),
+                            ("ADC -> G.711", adc_to_g711, codes),
+                            ("G.711 -> duty", lambda d: g711_to_duty(d, 25000),
+                             pcm_to_g711(pcm))):
+        start = time.perf_counter()
+        for _ in range(10):
+            func(arg)
+        rate = 10 * len(arg) / (time.perf_counter() - start)
+        print(f"[G711] {name:15s} {rate / 1e6:8.1f} M échantillons/s")
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Détection du combiné (décroché / raccroché) par interruption GPIO.
+
+Le contact du combiné est câblé entre HOOK_PIN et la masse, avec la
+résistance de pull-up interne : niveau bas = combiné décroché.
+Chaque front déclenche un callback (add_event_detect, sans polling) ;
+l'anti-rebond logiciel relit la broche une seule fois après DEBOUNCE_MS
+et n'émet un événement que si l'état stable a réellement changé.
+"""
+import sys
+import threading
+import time
+
+# -------------------------------------------------------
+# CONFIG COMBINÉ
+HOOK_PIN = 17          # GPIO (BCM) relié au contact du combiné
+DEBOUNCE_MS = 20       # Durée de stabilisation du contact
+
+OFF_HOOK = "OFF_HOOK"  # Combiné décroché
+ON_HOOK  = "ON_HOOK"   # Combiné raccroché
+
+# -------------------------------------------------------
+# BACKEND GPIO SIMULÉ
+class FakeGPIO:
+    """
+    Remplace RPi.GPIO hors du Pi (mêmes constantes, mêmes fonctions).
+    set_level() simule un changement de niveau et appelle les callbacks
+    enregistrés comme le ferait le thread d'interruption de RPi.GPIO.
+    """
+    BCM = 11
+    IN = 1
+    OUT = 0
+    HIGH = 1
+    LOW = 0
+    PUD_UP = 22
+    RISING = 31
+    FALLING = 32
+    BOTH = 33
+
+    def __init__(self):
+        self.levels = {}
+        self.callbacks = {}
+
+    def setmode(self, mode):
+        pass
+
+    def setup(self, pin, direction, pull_up_down=None):
+        self.levels.setdefault(pin, self.HIGH if pull_up_down == self.PUD_UP else self.LOW)
+
+    def input(self, pin):
+        return self.levels[pin]
+
+    def output(self, pin, level):
+        self.levels[pin] = level
+
+    def add_event_detect(self, pin, edge, callback=None, bouncetime=None):
+        self.callbacks[pin] = (edge, callback)
+
+    def remove_event_detect(self, pin):
+        self.callbacks.pop(pin, None)
+
+    def cleanup(self, pin=None):
+        if pin is None:
+            self.callbacks.clear()
+        else:
+            self.callbacks.pop(pin, None)
+
+    def set_level(self, pin, level):
+        """Force le niveau de la broche et déclenche le callback de front."""
+        old = self.levels.get(pin)
+        self.levels[pin] = level
+        if old == level or pin not in self.callbacks:
+            return
+        edge, callback = self.callbacks[pin]
+        rising = level == self.HIGH
+        if edge == self.BOTH or (edge == self.RISING) == rising:
+            callback(pin)
+
+# -------------------------------------------------------
+# DÉTECTION DU COMBINÉ
+class HookSwitch:
+    """
+    Surveille le contact du combiné et appelle callback(state, t_edge)
+    à chaque changement stable, avec t_edge l'instant (time.monotonic())
+    du premier front de la transition.
+    """
+
+    def __init__(self, callback, pin=HOOK_PIN, debounce_ms=DEBOUNCE_MS,
+                 gpio=None, active_low=True):
+        if gpio is None:
+            import RPi.GPIO as gpio
+        self.gpio = gpio
+        self.callback = callback
+        self.pin = pin
+        self.debounce_s = debounce_ms / 1000.0
+        self.active_low = active_low
+        self.state = None
+        self._lock = threading.Lock()
+        self._timer = None
+        self._t_edge = None
+
+    def _read_state(self):
+        low = self.gpio.input(self.pin) == self.gpio.LOW
+        return OFF_HOOK if low == self.active_low else ON_HOOK
+
+    def start(self):
+        """Configure la broche et active l'interruption sur les deux fronts."""
+        self.gpio.setmode(self.gpio.BCM)
+        self.gpio.setup(self.pin, self.gpio.IN, pull_up_down=self.gpio.PUD_UP)
+        self.state = self._read_state()
+        self.gpio.add_event_detect(self.pin, self.gpio.BOTH, callback=self._on_edge)
+
+    def stop(self):
+        self.gpio.remove_event_detect(self.pin)
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    def _on_edge(self, channel):
+        # Chaque rebond relance la fenêtre de stabilisation
+        with self._lock:
+            if self._timer is None:
+                self._t_edge = time.monotonic()
+            else:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.debounce_s, self._settle)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _settle(self):
+        with self._lock:
+            self._timer = None
+            t_edge = self._t_edge
+            new_state = self._read_state()
+            if new_state == self.state:
+                return
+            self.state = new_state
+        self.callback(new_state, t_edge)
+
+# -------------------------------------------------------
+# SIMULATION HORS CARTE
+if __name__ == "__main__":
+    gpio = FakeGPIO()
+    events = []
+    hook = HookSwitch(lambda state, t: events.append((state, time.monotonic() - t)),
+                      gpio=gpio)
+    hook.start()
+    print("[HOOK] État initial :", hook.state)
+
+    for target in (gpio.LOW, gpio.HIGH, gpio.LOW, gpio.HIGH):
+        # Rebonds du contact : 5 transitions en 5 ms avant stabilisation
+        for _ in range(5):
+            gpio.set_level(HOOK_PIN, target)
+            time.sleep(0.0005)
+            gpio.set_level(HOOK_PIN, 1 - target)
+            time.sleep(0.0005)
+        gpio.set_level(HOOK_PIN, target)
+        time.sleep(0.1)
+
+    # Impulsion parasite plus courte que la fenêtre : aucun événement
+    gpio.set_level(HOOK_PIN, gpio.LOW)
+    time.sleep(0.002)
+    gpio.set_level(HOOK_PIN, gpio.HIGH)
+    time.sleep(0.1)
+    hook.stop()
+
+    for state, latency in events:
+        print(f"[HOOK] {state} après {latency * 1000:.1f} ms")
+    expected = [OFF_HOOK, ON_HOOK, OFF_HOOK, ON_HOOK]
+    ok = [s for s, _ in events] == expected
+    print("[HOOK] Anti-rebond correct :", ok)
+    if not ok:
+        sys.exit("[HOOK] ÉCHEC : événements différents de la séquence attendue")
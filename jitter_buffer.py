@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Tampon de gigue adaptatif pour jouer l'audio de l'appel sur le haut-parleur PWM.
+
+Les trames (20 ms) arrivent par rafales depuis baresip ; la boucle de
+sortie PWM en demande une à chaque période. Le tampon :
+  - remet les trames dans l'ordre (numéro de séquence) et jette les retards,
+  - estime la gigue d'arrivée (estimateur RFC 3550) et adapte sa profondeur,
+  - masque les trames manquantes (répétition atténuée de la dernière trame),
+  - compresse / étire légèrement la lecture (±2 %) pour suivre l'écart
+    d'horloge entre baresip et le cadencement PWM sans accumuler de retard.
+
+    python3 jitter_buffer.py                        # simulation de gigue réseau
+    python3 jitter_buffer.py --pipe /tmp/pfe_spk.ulaw  # tube baresip -> PWM
+"""
+import argparse
+import math
+import os
+import sys
+import threading
+import time
+import numpy as np
+
+import metrics
+
+# -------------------------------------------------------
+# CONFIG
+SAMPLE_RATE = 8000
+FRAME_SIZE  = 160      # 20 ms à 8 kHz
+MIN_DEPTH   = 1        # Profondeur visée minimale / maximale (en trames)
+MAX_DEPTH   = 12
+MAX_STRETCH = 0.02     # Écart maximal de vitesse de lecture
+MAX_CONCEAL = 5        # Trames masquées d'affilée avant de re-remplir le tampon
+CONCEAL_FADE = 0.5     # Atténuation à chaque trame masquée consécutive
+
+# -------------------------------------------------------
+# TAMPON DE GIGUE
+class JitterBuffer:
+    """
+    push(seq, samples) côté réception, pull() côté sortie PWM, depuis deux
+    threads différents (verrou interne). Les échantillons sont des float
+    normalisés dans [-1, 1].
+    """
+
+    def __init__(self, frame_size=FRAME_SIZE, sample_rate=SAMPLE_RATE,
+                 min_depth=MIN_DEPTH, max_depth=MAX_DEPTH, max_stretch=MAX_STRETCH):
+        self.frame_size = frame_size
+        self.sample_rate = sample_rate
+        self.frame_s = frame_size / sample_rate
+        self.min_depth = min_depth
+        self.max_depth = max_depth
+        self.max_stretch = max_stretch
+
+        self.packets = {}
+        self.next_seq = None
+        self.started = False
+        self.fifo = np.zeros(frame_size * (max_depth + 4))
+        self.fill = 0
+        self.last_frame = np.zeros(frame_size)
+        self.conceal_run = 0
+
+        self.jitter = 0.0          # Gigue estimée (s)
+        self._prev_transit = None
+        self.target = min_depth * frame_size
+
+        self._silence = np.zeros(frame_size)
+        self._index = np.arange(frame_size, dtype=np.float64)
+        self._xp = np.arange(2 * frame_size, dtype=np.float64)
+
+        self._lock = threading.Lock()
+        self.stats = {"pulls": 0, "underruns": 0, "concealed": 0, "late": 0,
+                      "stretched": 0, "latency_sum": 0.0, "latency_max": 0.0}
+
+    # ---------------------------------------------------
+    # RÉCEPTION
+    def push(self, seq, samples, now=None):
+        """Ajoute une trame reçue ; renvoie False si elle arrive trop tard."""
+        with self._lock:
+            if now is None:
+                now = time.monotonic()
+            # Gigue d'arrivée (RFC 3550) : variation du temps de transit
+            transit = now - seq * self.frame_s
+            if self._prev_transit is not None:
+                d = abs(transit - self._prev_transit)
+                self.jitter += (d - self.jitter) / 16.0
+            self._prev_transit = transit
+            depth = math.ceil((self.frame_s + 3.0 * self.jitter) / self.frame_s)
+            self.target = min(max(depth, self.min_depth), self.max_depth) * self.frame_size
+
+            if self.next_seq is not None and seq < self.next_seq:
+                self.stats["late"] += 1
+                return False
+            if len(self.packets) >= self.max_depth * 2:
+                # Tampon saturé : on jette la trame la plus ancienne
+                del self.packets[min(self.packets)]
+            self.packets[seq] = np.asarray(samples, dtype=np.float64)
+            return True
+
+    def depth(self):
+        """Profondeur actuelle en échantillons (tampon + trames en attente)."""
+        return self.fill + len(self.packets) * self.frame_size
+
+    # ---------------------------------------------------
+    # SORTIE
+    def _append(self, frame):
+        n = len(frame)
+        self.fifo[self.fill:self.fill + n] = frame
+        self.fill += n
+
+    def _refill(self, need):
+        """Complète la FIFO d'échantillons jusqu'à need, en masquant les trous."""
+        while self.fill < need:
+            if self.next_seq in self.packets:
+                frame = self.packets.pop(self.next_seq)
+                self._append(frame)
+                self.last_frame[:] = frame
+                self.conceal_run = 0
+            elif self.conceal_run < MAX_CONCEAL:
+                # Trame manquante : répétition atténuée de la précédente
+                if not self.packets:
+                    self.stats["underruns"] += 1
+                    metrics.pwm_underruns.inc()
+                self.last_frame *= CONCEAL_FADE
+                self._append(self.last_frame)
+                self.conceal_run += 1
+                self.stats["concealed"] += 1
+            else:
+                return False
+            self.next_seq += 1
+        return True
+
+    def pull(self):
+        """Renvoie la prochaine trame de FRAME_SIZE échantillons à jouer."""
+        with self._lock:
+            self.stats["pulls"] += 1
+            if not self.started:
+                # Pré-remplissage jusqu'à la profondeur visée
+                if not self.packets or self.depth() < self.target:
+                    return self._silence
+                self.started = True
+                self.next_seq = min(self.packets)
+
+            depth = self.depth()
+            latency = depth / self.sample_rate
+            self.stats["latency_sum"] += latency
+            self.stats["latency_max"] = max(self.stats["latency_max"], latency)
+
+            # Vitesse de lecture : rattraper l'écart à la profondeur visée,
+            # avec une zone morte d'une demi-trame autour de la cible
+            error = (depth - self.target) / self.frame_size
+            if abs(error) < 0.5:
+                error = 0.0
+            ratio = min(max(0.05 * error, -self.max_stretch), self.max_stretch)
+            need = int(round(self.frame_size * (1.0 + ratio)))
+
+            if not self._refill(need):
+                # Trop de pertes d'affilée : on coupe et on re-remplit
+                self.stats["underruns"] += 1
+                metrics.pwm_underruns.inc()
+                self.started = False
+                self.fill = 0
+                self.conceal_run = 0
+                return self._silence
+
+            if need == self.frame_size:
+                out = self.fifo[:need].copy()
+            else:
+                self.stats["stretched"] += 1
+                pos = self._index * ((need - 1) / (self.frame_size - 1))
+                out = np.interp(pos, self._xp[:need], self.fifo[:need])
+            remaining = self.fill - need
+            self.fifo[:remaining] = self.fifo[need:self.fill]
+            self.fill = remaining
+            return out
+
+    def report(self):
+        s = self.stats
+        played = max(s["pulls"], 1)
+        return {
+            "latence_moy_ms": 1000 * s["latency_sum"] / played,
+            "latence_max_ms": 1000 * s["latency_max"],
+            "gigue_ms": 1000 * float(self.jitter),
+            "profondeur_visee": self.target // self.frame_size,
+            "sous_debits": s["underruns"],
+            "trames_masquees": s["concealed"],
+            "trames_en_retard": s["late"],
+            "trames_etirees": s["stretched"],
+        }
+
+# -------------------------------------------------------
+# ENTRÉE / SORTIE
+def read_pipe(jb, path, law="ulaw"):
+    """
+    Lit des trames G.711 de 20 ms depuis un tube nommé (sortie de baresip)
+    et les pousse dans le tampon. Le tube n'a pas de numéro de séquence :
+    l'ordre de lecture en tient lieu.
+    """
+    from g711 import g711_to_pcm
+    with open(path, "rb") as f:
+        seq = 0
+        while True:
+            data = f.read(jb.frame_size)
+            if len(data) < jb.frame_size:
+                break
+            jb.push(seq, g711_to_pcm(data, law) / 32767.0)
+            seq += 1
+
+def pwm_output_loop(jb, update_duty_cycle, running=lambda: True):
+    """
+    Boucle de sortie PWM alimentée par le tampon, même normalisation [0, 1]
+    que process_audio_file. Chaque échantillon est écrit à son échéance
+    (attente active, comme measure_paced de pwm_calibration) : pas de
+    rafale par trame. Un échantillon déjà en retard de plus d'une période
+    est sauté et compté (pwm_late_samples), pour que la sortie consomme le
+    tampon en temps réel même si les écritures sont trop lentes.
+    """
+    period = 1.0 / jb.sample_rate
+    next_t = time.perf_counter()
+    while running():
+        frame = jb.pull()
+        written = 0
+        for sample in (frame + 1.0) * 0.5:
+            now = time.perf_counter()
+            if now > next_t + period:
+                metrics.pwm_late_samples.inc()
+            else:
+                while now < next_t:
+                    now = time.perf_counter()
+                update_duty_cycle(sample)
+                written += 1
+            next_t += period
+        metrics.pwm_writes.inc(written)
+
+def play_pipe(path, law="ulaw"):
+    """
+    Lecture en direct : tube baresip -> tampon -> PWM de AudioToPWM (profil
+    de calibration compris). Le tube est lu dans un thread, la sortie PWM
+    tourne dans le thread appelant jusqu'à la fermeture du tube.
+    """
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "AudioTests"))
+    import AudioToPWM
+    AudioToPWM.pwm_setup()
+    jb = JitterBuffer()
+    reader = threading.Thread(target=read_pipe, args=(jb, path, law), daemon=True)
+    reader.start()
+    try:
+        pwm_output_loop(jb, AudioToPWM.update_duty_cycle, reader.is_alive)
+    finally:
+        AudioToPWM.pwm_cleanup()
+    return jb.report()
+
+# -------------------------------------------------------
+# SIMULATION DE GIGUE RÉSEAU
+def simulate(seconds=60, drift=0.003, base_delay=0.04, jitter_ms=15.0,
+             burst_prob=0.03, loss=0.02, seed=0):
+    """
+    Simulation en temps virtuel : l'émetteur envoie une trame toutes les
+    20 ms selon son horloge (décalée de drift), le réseau ajoute un retard
+    aléatoire avec des rafales, et la sortie PWM tire une trame toutes les
+    20 ms selon l'horloge locale.
+    """
+    rng = np.random.default_rng(seed)
+    jb = JitterBuffer()
+    frame_s = jb.frame_s
+    # Quelques trames de plus que la durée jouée, pour ne pas compter la fin du flux
+    n = int(seconds / frame_s * (1.0 + drift)) + 50
+    t = np.arange(FRAME_SIZE) / SAMPLE_RATE
+
+    send = np.arange(n) * frame_s / (1.0 + drift)
+    delay = base_delay + rng.gamma(2.0, jitter_ms / 2000.0, n)
+    burst = rng.random(n) < burst_prob
+    delay[burst] += rng.uniform(0.08, 0.2, burst.sum())
+    arrival = send + delay
+    kept = rng.random(n) >= loss
+    order = [i for i in np.argsort(arrival) if kept[i]]
+
+    k = 0
+    pull_t = 0.0
+    while pull_t < seconds:
+        while k < len(order) and arrival[order[k]] <= pull_t:
+            seq = order[k]
+            jb.push(seq, 0.3 * np.sin(2 * np.pi * 440 * (t + seq * frame_s)),
+                    now=arrival[seq])
+            k += 1
+        jb.pull()
+        pull_t += frame_s
+    return jb.report()
+
+def print_report(title, report):
+    print(title)
+    for key, value in report.items():
+        print(f"       {key:18s} {value:.1f}" if isinstance(value, float)
+              else f"       {key:18s} {value}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tampon de gigue devant la sortie PWM")
+    parser.add_argument("--pipe", help="tube G.711 à jouer (sinon : simulation de gigue)")
+    parser.add_argument("--law", choices=("ulaw", "alaw"), default="ulaw")
+    args = parser.parse_args()
+
+    if args.pipe:
+        metrics.start_exporters()
+        print_report(f"[JB] Lecture de {args.pipe} :", play_pipe(args.pipe, args.law))
+    else:
+        for label, kwargs in (("réseau calme", dict(jitter_ms=2.0, burst_prob=0.0, loss=0.0)),
+                              ("gigue + pertes", dict()),
+                              ("rafales fortes", dict(jitter_ms=30.0, burst_prob=0.08))):
+            print_report(f"[JB] {label} :", simulate(**kwargs))
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Métriques des chemins critiques (sonnerie, lecture PWM, capture SPI, contrôleur).
+
+Activées par la variable d'environnement PFE_METRICS=1 ; sinon counter()
+et histogram() renvoient des objets vides dont inc()/observe() ne font
+rien, pour un coût quasi nul dans les boucles par échantillon.
+
+Compteurs et histogrammes sans verrou : chaque thread incrémente ses
+propres cases (une entrée par identifiant de thread), seul le lecteur
+additionne les cases de tous les threads au moment de l'export.
+
+Exports :
+  - fichier texte au format Prometheus (PFE_METRICS_FILE, pour le
+    collecteur textfile de node_exporter),
+  - point HTTP local /metrics (PFE_METRICS_PORT),
+  - ligne de log périodique (PFE_METRICS_INTERVAL secondes, 10 par défaut).
+Profilage par échantillonnage optionnel : PFE_PROFILE=1 (lignes les plus
+chaudes dans le log périodique, sur /profile et à la sortie du programme).
+"""
+import atexit
+import bisect
+import collections
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+ENABLED = os.environ.get("PFE_METRICS", "0") == "1"
+
+# Bornes des histogrammes de latence (secondes)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0)
+
+_registry = []
+_registry_lock = threading.Lock()
+
+# -------------------------------------------------------
+# MÉTRIQUES
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._slots = {}
+
+    def inc(self, n=1):
+        tid = threading.get_ident()
+        self._slots[tid] = self._slots.get(tid, 0) + n
+
+    def value(self):
+        return sum(list(self._slots.values()))
+
+    def prometheus(self):
+        return [f"# HELP {self.name} {self.help}",
+                f"# TYPE {self.name} counter",
+                f"{self.name} {self.value()}"]
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._slots = {}
+
+    def observe(self, value):
+        tid = threading.get_ident()
+        slot = self._slots.get(tid)
+        if slot is None:
+            # [compteurs par case..., +Inf, somme]
+            slot = self._slots[tid] = [0] * (len(self.buckets) + 1) + [0.0]
+        slot[bisect.bisect_left(self.buckets, value)] += 1
+        slot[-1] += value
+
+    def snapshot(self):
+        """(compteurs par case, nombre total, somme) cumulés sur tous les threads."""
+        counts = [0] * (len(self.buckets) + 1)
+        total = 0.0
+        for slot in list(self._slots.values()):
+            for i in range(len(counts)):
+                counts[i] += slot[i]
+            total += slot[-1]
+        return counts, sum(counts), total
+
+    def quantile(self, q):
+        """Borne supérieure de la case contenant le quantile q."""
+        counts, n, _ = self.snapshot()
+        if n == 0:
+            return 0.0
+        target = q * n
+        acc = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            acc += count
+            if acc >= target:
+                return bound
+        return float("inf")
+
+    def prometheus(self):
+        counts, n, total = self.snapshot()
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        acc = 0
+        for bound, count in zip(self.buckets, counts):
+            acc += count
+            lines.append(f'{self.name}_bucket{{le="{bound}"}} {acc}')
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {n}')
+        lines.append(f"{self.name}_sum {total}")
+        lines.append(f"{self.name}_count {n}")
+        return lines
+
+
+class _NullMetric:
+    """Métrique désactivée : toutes les opérations sont vides."""
+
+    def inc(self, n=1):
+        pass
+
+    def observe(self, value):
+        pass
+
+
+_NULL = _NullMetric()
+
+def counter(name, help_text):
+    if not ENABLED:
+        return _NULL
+    metric = Counter(name, help_text)
+    with _registry_lock:
+        _registry.append(metric)
+    return metric
+
+def histogram(name, help_text, buckets=LATENCY_BUCKETS):
+    if not ENABLED:
+        return _NULL
+    metric = Histogram(name, help_text, buckets)
+    with _registry_lock:
+        _registry.append(metric)
+    return metric
+
+# -------------------------------------------------------
+# MÉTRIQUES DU PROJET
+pwm_writes      = counter("pfe_pwm_writes_total", "Écritures duty_cycle PWM")
+pwm_underruns   = counter("pfe_pwm_underruns_total",
+                          "Trames manquantes du tampon de la sortie PWM (sous-débits)")
+pwm_late_samples = counter("pfe_pwm_late_samples_total",
+                           "Échantillons PWM en retard de plus d'une période")
+spi_samples     = counter("pfe_spi_samples_total", "Échantillons lus sur le MCP3008")
+capture_drops   = counter("pfe_capture_dropped_frames_total", "Trames de capture jetées")
+capture_latency = histogram("pfe_capture_to_wire_seconds",
+                            "Latence micro -> sortie baresip par trame")
+event_latency   = histogram("pfe_event_to_command_seconds",
+                            "Latence événement (combiné, DTMF) -> commande baresip")
+ring_cadence_error = histogram("pfe_ring_cadence_error_seconds",
+                               "Écart entre durée de sonnerie/pause réelle et nominale")
+
+# -------------------------------------------------------
+# EXPORTS
+def render():
+    """Texte au format d'exposition Prometheus."""
+    lines = []
+    with _registry_lock:
+        metrics = list(_registry)
+    for metric in metrics:
+        lines += metric.prometheus()
+    return "\n".join(lines) + "\n"
+
+def write_textfile(path):
+    """Écriture atomique (fichier temporaire puis renommage)."""
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        f.write(render())
+    os.replace(tmp, path)
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/metrics":
+            body = render().encode()
+        elif self.path == "/profile":
+            body = ("\n".join(profile_report()) + "\n").encode()
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def serve_http(port, host="127.0.0.1"):
+    server = HTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def log_line(previous, interval):
+    """Ligne de résumé ; les compteurs sont donnés en débit par seconde."""
+    parts = []
+    with _registry_lock:
+        metrics = list(_registry)
+    for metric in metrics:
+        short = metric.name.replace("pfe_", "").replace("_total", "").replace("_seconds", "")
+        if isinstance(metric, Counter):
+            value = metric.value()
+            parts.append(f"{short}={(value - previous.get(metric.name, 0)) / interval:.0f}/s")
+            previous[metric.name] = value
+        else:
+            _, n, _ = metric.snapshot()
+            if n:
+                parts.append(f"{short}_p50={1000 * metric.quantile(0.5):g}ms"
+                             f" p99={1000 * metric.quantile(0.99):g}ms")
+    return "[METRICS] " + " ".join(parts)
+
+def _reporter(interval, path):
+    previous = {}
+    while True:
+        time.sleep(interval)
+        print(log_line(previous, interval))
+        if _profiling:
+            print_profile()
+        if path:
+            write_textfile(path)
+
+# -------------------------------------------------------
+# PROFILAGE PAR ÉCHANTILLONNAGE
+_profile = collections.Counter()
+_profiling = False
+
+def _sampler(interval):
+    me = threading.get_ident()
+    while True:
+        time.sleep(interval)
+        for tid, frame in sys._current_frames().items():
+            if tid == me:
+                continue
+            code = frame.f_code
+            _profile[(os.path.basename(code.co_filename), frame.f_lineno, code.co_name)] += 1
+
+def start_profiler(interval=0.005):
+    """
+    Relève la ligne en cours de chaque thread toutes les interval secondes ;
+    le résumé est aussi affiché à la sortie du programme.
+    """
+    global _profiling
+    if _profiling:
+        return
+    _profiling = True
+    threading.Thread(target=_sampler, args=(interval,), daemon=True).start()
+    atexit.register(print_profile)
+
+def profile_report(top=10):
+    # Copie : le thread d'échantillonnage continue d'écrire pendant le tri
+    profile = _profile.copy()
+    total = sum(profile.values()) or 1
+    return [f"{100 * n / total:5.1f} %  {f}:{line} {func}"
+            for (f, line, func), n in profile.most_common(top)]
+
+def print_profile(top=10):
+    for line in profile_report(top):
+        print("[PROFILE] " + line)
+
+# -------------------------------------------------------
+# DÉMARRAGE
+def start_exporters():
+    """Lance les exports configurés par l'environnement (si PFE_METRICS=1)."""
+    if not ENABLED:
+        return
+    port = os.environ.get("PFE_METRICS_PORT")
+    if port:
+        serve_http(int(port))
+    interval = float(os.environ.get("PFE_METRICS_INTERVAL", "10"))
+    path = os.environ.get("PFE_METRICS_FILE")
+    threading.Thread(target=_reporter, args=(interval, path), daemon=True).start()
+    if os.environ.get("PFE_PROFILE", "0") == "1":
+        start_profiler()
+
+if __name__ == "__main__":
+    # Coût d'un inc() activé / désactivé
+    n = 1_000_000
+    for label, metric in (("désactivé", _NULL), ("activé", Counter("bench", "bench"))):
+        start = time.perf_counter()
+        for _ in range(n):
+            metric.inc()
+        print(f"[METRICS] inc() {label} : {1e9 * (time.perf_counter() - start) / n:.0f} ns")
+    hist = Histogram("bench_latency_seconds", "bench")
+    start = time.perf_counter()
+    for i in range(n):
+        hist.observe((i % 1000) * 1e-4)
+    print(f"[METRICS] observe() : {1e9 * (time.perf_counter() - start) / n:.0f} ns, "
+          f"p50 <= {hist.quantile(0.5)} s")
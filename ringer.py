@@ -1,6 +1,8 @@
 import time
 import os
 
+import metrics
+
 # Chemins des PWM
 PWM0_PATH = "/sys/class/pwm/pwmchip0/pwm0"
 PWM1_PATH = "/sys/class/pwm/pwmchip0/pwm1"
@@ -54,8 +56,11 @@ DUTY_NS = 10000000    # 10 ms
 init_pwm(PWM0_PATH, PERIOD_NS, DUTY_NS)
 init_pwm(PWM1_PATH, PERIOD_NS, DUTY_NS)
 
+metrics.start_exporters()
+
 # Boucle principale pour cadencer les PWM
 try:
+    t_phase = time.monotonic()
     while True:
         # Activer PWM0 et PWM1 avec des polarités inversées (sonnerie de 1.5 s)
         set_pwm(PWM0_PATH, "normal")
@@ -66,8 +71,15 @@ try:
         # Pause de 3 secondes (les PWM sont désactivés)
         disable_pwm(PWM0_PATH)
         disable_pwm(PWM1_PATH)
+        # Écart de cadence : durée réelle de la phase - durée nominale
+        now = time.monotonic()
+        metrics.ring_cadence_error.observe(abs(now - t_phase - 1.5))
+        t_phase = now
         print("et ça attend.")
         time.sleep(3)
+        now = time.monotonic()
+        metrics.ring_cadence_error.observe(abs(now - t_phase - 3))
+        t_phase = now
 
 except KeyboardInterrupt:
     # Arrêter proprement en cas d'interruption
@@ -1,5 +1,14 @@
 #!/usr/bin/env bash
 
+# Micro : le pont audio de baresip_ctrl.py écrit le PCM (s16le 8 kHz mono)
+# dans un tube nommé, aplay le recopie dans la boucle ALSA, baresip lit
+# l'autre extrémité
+# (~/.baresip/config : audio_source alsa,plughw:Loopback,1,0)
+MIC_PIPE=/tmp/pfe_mic.pcm
+sudo modprobe snd-aloop
+[ -p "$MIC_PIPE" ] || mkfifo "$MIC_PIPE"
+aplay -q -t raw -f S16_LE -r 8000 -c 1 -D plughw:Loopback,0,0 "$MIC_PIPE" &
+
 # Lancer Baresip (en arrière‐plan)
 baresip &
 
@@ -3,7 +3,9 @@ import spidev
 import RPi.GPIO as GPIO
 import time
 import wave
-import struct
+import numpy as np
+
+from capture_dsp import default_chain, BLOCK_SIZE
 
 # Paramètres du montage et de l'enregistrement
 CS_PIN = 22              # GPIO utilisé pour la gestion manuelle du CS
@@ -13,17 +15,22 @@ SAMPLE_RATE = 8000       # Taux d'échantillonnage en Hz (8000 Hz pour tester)
 DURATION = 10            # Durée d'enregistrement en secondes
 CHANNEL_ADC = 0          # Canal du MCP3008 utilisé (0 à 7)
 
-# Initialisation de la gestion du GPIO pour la CS manuelle
-GPIO.setmode(GPIO.BCM)
-GPIO.setup(CS_PIN, GPIO.OUT)
-GPIO.output(CS_PIN, GPIO.HIGH)  # CS inactif
+spi = None               # Périphérique SPI, ouvert par init_adc()
+
+def init_adc():
+    """Configure le CS manuel (GPIO) et ouvre le bus SPI du MCP3008."""
+    global spi
+    # Initialisation de la gestion du GPIO pour la CS manuelle
+    GPIO.setmode(GPIO.BCM)
+    GPIO.setup(CS_PIN, GPIO.OUT)
+    GPIO.output(CS_PIN, GPIO.HIGH)  # CS inactif
 
-# Initialisation du périphérique SPI
-spi = spidev.SpiDev()
-spi.open(SPI_BUS, SPI_DEVICE)
-spi.max_speed_hz = 1000000  # 1 MHz (adapter si besoin)
-spi.mode = 0
-spi.no_cs = True          # On gère le CS manuellement via GPIO
+    # Initialisation du périphérique SPI
+    spi = spidev.SpiDev()
+    spi.open(SPI_BUS, SPI_DEVICE)
+    spi.max_speed_hz = 1000000  # 1 MHz (adapter si besoin)
+    spi.mode = 0
+    spi.no_cs = True          # On gère le CS manuellement via GPIO
 
 def read_adc(channel):
     """
@@ -41,42 +48,52 @@ def read_adc(channel):
     value = ((resp[1] & 3) << 8) | resp[2]
     return value
 
-# Enregistrement des échantillons pendant DURATION secondes
-print("Enregistrement en cours...")
-num_samples = int(SAMPLE_RATE * DURATION)
-samples = []
+def record():
+    """Enregistre DURATION secondes et les écrit dans audio_test.wav."""
+    # Enregistrement des échantillons pendant DURATION secondes
+    print("Enregistrement en cours...")
+    num_samples = int(SAMPLE_RATE * DURATION)
+    samples = []
+
+    start_time = time.time()
+    for _ in range(num_samples):
+        # Lecture d'un échantillon sur le canal spécifié
+        adc_value = read_adc(CHANNEL_ADC)
+        samples.append(adc_value)
+        # Attendre le prochain échantillon (approximativement)
+        time.sleep(1.0 / SAMPLE_RATE)
 
-start_time = time.time()
-for _ in range(num_samples):
-    # Lecture d'un échantillon sur le canal spécifié
-    adc_value = read_adc(CHANNEL_ADC)
-    samples.append(adc_value)
-    # Attendre le prochain échantillon (approximativement)
-    time.sleep(1.0 / SAMPLE_RATE)
+    print("Enregistrement terminé. Nombre d'échantillons :", len(samples))
 
-print("Enregistrement terminé. Nombre d'échantillons :", len(samples))
+    # Conversion des valeurs 10 bits (0-1023) en échantillons 16 bits signés.
+    # La chaîne DSP retire le décalage réel du micro (au lieu de supposer 512),
+    # limite à la bande voix et ajuste le gain pour exploiter toute la dynamique.
+    chain = default_chain()
+    codes = np.array(samples, dtype=np.int16)
+    # Dernier bloc incomplet : complété en répétant le dernier échantillon
+    pad = -len(codes) % BLOCK_SIZE
+    codes = np.pad(codes, (0, pad), mode='edge')
+    wav_samples = np.empty(len(codes), dtype=np.int16)
+    for i in range(0, len(codes), BLOCK_SIZE):
+        wav_samples[i:i + BLOCK_SIZE] = chain.process_adc(codes[i:i + BLOCK_SIZE])
+    wav_samples = wav_samples[:len(samples)]
+    for name, us, load in chain.report():
+        print(f"DSP {name} : {us:.1f} µs/bloc ({load:.2f} % du temps réel)")
 
-# Conversion des valeurs 10 bits (0-1023) en échantillons 16 bits signés.
-# On suppose qu'une valeur médiane (environ 512) correspond au silence.
-wav_samples = []
-for s in samples:
-    # Échelle sur 0-65535
-    scaled = int((s / 1023.0) * 65535)
-    # Conversion en entier signé sur 16 bits (de -32768 à 32767)
-    signed = scaled - 32768
-    wav_samples.append(signed)
+    # Enregistrement dans un fichier WAV
+    output_file = "audio_test.wav"
+    wf = wave.open(output_file, 'w')
+    wf.setnchannels(1)        # Mono
+    wf.setsampwidth(2)        # 16 bits = 2 octets par échantillon
+    wf.setframerate(SAMPLE_RATE)
+    wf.writeframes(wav_samples.astype('<i2').tobytes())
+    wf.close()
 
-# Enregistrement dans un fichier WAV
-output_file = "audio_test.wav"
-wf = wave.open(output_file, 'w')
-wf.setnchannels(1)        # Mono
-wf.setsampwidth(2)        # 16 bits = 2 octets par échantillon
-wf.setframerate(SAMPLE_RATE)
-for sample in wav_samples:
-    wf.writeframes(struct.pack('<h', sample))
-wf.close()
+    print("Fichier WAV créé :", output_file)
 
-print("Fichier WAV créé :", output_file)
+    # Nettoyage du GPIO
+    GPIO.cleanup()
 
-# Nettoyage du GPIO
-GPIO.cleanup()
+if __name__ == "__main__":
+    init_adc()
+    record()